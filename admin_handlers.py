@@ -1,27 +1,35 @@
 import os
+import time
+import asyncio
+import uuid
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, MessageHandler, filters, CallbackQueryHandler
 from config import ADMIN_ID, SUBJECTS_FOLDER
-from database import DatabaseManager
-from file_parser import FileParser
+from database import AsyncDatabaseManager
+from file_parser import FileParser, SUPPORTED_EXTENSIONS
+from bank_cache import BankCache
+from bank_loader import ParserError
 
 logger = logging.getLogger(__name__)
 
 class AdminHandlers:
-    def __init__(self, db: DatabaseManager):
+    def __init__(self, db: AsyncDatabaseManager, questions_cache: BankCache):
         self.db = db
+        self.questions_cache = questions_cache
+    
+    async def ensure_main_admin(self):
         # Dastlabki adminni qo'shish
-        if not self.db.is_admin(ADMIN_ID):
-            self.db.add_admin(ADMIN_ID, "AsosiyAdmin")
+        if not await self.db.is_admin(ADMIN_ID):
+            await self.db.add_admin(ADMIN_ID, "AsosiyAdmin")
     
-    def is_admin(self, user_id):
-        return self.db.is_admin(user_id)
+    async def is_admin(self, user_id):
+        return await self.db.is_admin(user_id)
     
     async def admin_panel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.message.from_user.id
         
-        if not self.is_admin(user_id):
+        if not await self.is_admin(user_id):
             await update.message.reply_text("❌ Siz admin emassiz!")
             return
         
@@ -40,11 +48,11 @@ class AdminHandlers:
         query = update.callback_query
         user_id = query.from_user.id
         
-        if not self.is_admin(user_id):
+        if not await self.is_admin(user_id):
             await query.answer("❌ Siz admin emassiz!", show_alert=True)
             return
         
-        admins = self.db.get_admins()
+        admins = await self.db.get_admins()
         
         admin_list = "👥 Adminlar ro'yxati:\n\n"
         for admin_id, username in admins:
@@ -62,7 +70,7 @@ class AdminHandlers:
     async def add_admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.message.from_user.id
         
-        if not self.is_admin(user_id):
+        if not await self.is_admin(user_id):
             await update.message.reply_text("❌ Siz admin emassiz!")
             return
         
@@ -71,7 +79,7 @@ class AdminHandlers:
                 new_admin_id = int(context.args[0])
                 new_admin_username = ' '.join(context.args[1:]) if len(context.args) > 1 else "Yangi admin"
                 
-                if self.db.add_admin(new_admin_id, new_admin_username):
+                if await self.db.add_admin(new_admin_id, new_admin_username):
                     await update.message.reply_text(f"✅ Admin muvaffaqiyatli qo'shildi!\nID: {new_admin_id}")
                 else:
                     await update.message.reply_text("❌ Admin qo'shishda xatolik!")
@@ -86,7 +94,7 @@ class AdminHandlers:
     async def remove_admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.message.from_user.id
         
-        if not self.is_admin(user_id):
+        if not await self.is_admin(user_id):
             await update.message.reply_text("❌ Siz admin emassiz!")
             return
         
@@ -98,7 +106,7 @@ class AdminHandlers:
                     await update.message.reply_text("❌ O'zingizni adminlikdan o'chira olmaysiz!")
                     return
                 
-                if self.db.remove_admin(admin_id_to_remove):
+                if await self.db.remove_admin(admin_id_to_remove):
                     await update.message.reply_text(f"✅ Admin muvaffaqiyatli o'chirildi!\nID: {admin_id_to_remove}")
                 else:
                     await update.message.reply_text("❌ Admin o'chirishda xatolik!")
@@ -113,7 +121,7 @@ class AdminHandlers:
     async def add_subject_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.message.from_user.id
         
-        if not self.is_admin(user_id):
+        if not await self.is_admin(user_id):
             await update.message.reply_text("❌ Siz admin emassiz!")
             return
         
@@ -123,7 +131,8 @@ class AdminHandlers:
             context.user_data['subject_name'] = subject_name
             await update.message.reply_text(
                 f"📝 Fan nomi: {subject_name}\n"
-                f"📎 Endi ushbu fan uchun Word yoki PDF fayl yuboring."
+                f"📎 Endi ushbu fan uchun Word yoki PDF fayl yuboring.\n"
+                f"Tayyor bazalar uchun CSV, TSV yoki JSONL ham qabul qilinadi."
             )
         else:
             await update.message.reply_text(
@@ -134,7 +143,7 @@ class AdminHandlers:
     async def handle_admin_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.message.from_user.id
         
-        if not self.is_admin(user_id):
+        if not await self.is_admin(user_id):
             await update.message.reply_text("❌ Siz admin emassiz!")
             return
         
@@ -145,31 +154,182 @@ class AdminHandlers:
         document = update.message.document
         file_name = document.file_name.lower()
         
-        if not (file_name.endswith('.docx') or file_name.endswith('.pdf')):
-            await update.message.reply_text("❌ Iltimos, faqat Word (.docx) yoki PDF fayl yuboring.")
+        if not file_name.endswith(SUPPORTED_EXTENSIONS):
+            await update.message.reply_text(
+                "❌ Iltimos, Word (.docx), PDF yoki jadval (.csv, .tsv, .jsonl) fayl yuboring.\n\n"
+                "Jadvalda sarlavha qatori bo'lsin: savol, A, B, C, D, javob"
+            )
             return
         
-        # Faylni yuklash
+        # Fayl avval vaqtinchalik nomga yuklanadi: ishlayotgan fan fayli
+        # faqat yangi fayl muvaffaqiyatli tahlil qilingandan keyin almashtiriladi
+        subject_name = context.user_data['subject_name']
         file = await context.bot.get_file(document.file_id)
-        file_path = f"{SUBJECTS_FOLDER}/{context.user_data['subject_name']}_{file_name}"
+        file_path = f"{SUBJECTS_FOLDER}/{subject_name}_{file_name}"
+        upload_path = f"{SUBJECTS_FOLDER}/.upload-{uuid.uuid4().hex}_{file_name}"
         os.makedirs(SUBJECTS_FOLDER, exist_ok=True)
-        await file.download_to_drive(file_path)
+        await file.download_to_drive(upload_path)
         
-        # Fan ma'lumotlarini saqlash
-        subject_name = context.user_data['subject_name']
-        if self.db.add_subject(subject_name, file_path):
-            await update.message.reply_text(f"✅ '{subject_name}' fani muvaffaqiyatli qo'shildi!")
-        else:
-            await update.message.reply_text("❌ Fan qo'shishda xatolik yuz berdi!")
+        await update.message.reply_text(
+            f"⏳ '{subject_name}' fayli qabul qilindi.\n"
+            f"Savollar tahlil qilinmoqda, tayyor bo'lgach xabar beriladi."
+        )
+        # Tahlil fonda bajariladi, admin natijani alohida xabarda oladi
+        context.application.create_task(
+            self.compile_subject(context, user_id, subject_name, upload_path, file_path)
+        )
         
         # User datani tozalash
         context.user_data.pop('waiting_for_subject_name', None)
         context.user_data.pop('subject_name', None)
     
+    async def compile_subject(self, context: ContextTypes.DEFAULT_TYPE, admin_id: int,
+                              subject_name: str, upload_path: str, file_path: str):
+        """Yuklangan faylni tahlil qilish; muvaffaqiyatli bo'lsa fan fayli almashtiriladi"""
+        started = time.perf_counter()
+        error = None
+        try:
+            # Vaqtinchalik fayl fan va keshga tegmasdan tekshiriladi
+            bank, _ = await self.questions_cache.loader.load(upload_path, upload_path)
+            if not len(bank):
+                error = "faylda savollar topilmadi"
+            if hasattr(bank, 'close'):
+                bank.close()
+        except ParserError as e:
+            # Cheklovlar (vaqt, xotira, arxiv hajmi) yoki tahlil xatoligi
+            error = f"faylni tahlil qilib bo'lmadi: {e}"
+        except Exception as e:
+            logger.error(f"Fanni tahlil qilishda xatolik ({upload_path}): {e}")
+            error = "faylni tahlil qilishda xatolik yuz berdi"
+        
+        if error is not None:
+            logger.error(f"'{subject_name}' yangi fayli qabul qilinmadi: {error}")
+            # Muvaffaqiyatsiz tahlil .qbank yozmaydi, lekin PDF sahifalar keshi qolishi mumkin
+            await self._remove_cache(await self._file_hash(upload_path))
+            self._remove_upload(upload_path)
+            if await self.db.get_subject_id(subject_name) is not None:
+                outcome = "Fan avvalgi fayli bilan o'zgarishsiz qoldi."
+            else:
+                outcome = "Fan qo'shilmadi."
+            await context.bot.send_message(
+                chat_id=admin_id,
+                text=f"❌ '{subject_name}': {error}.\n\n"
+                     f"{outcome} Fayl formatini tekshirib, qaytadan yuboring."
+            )
+            return
+        
+        # Almashtiriladigan fayl keshlari yangi fayl o'rnatilgach o'chiriladi
+        old_id = await self.db.get_subject_id(subject_name)
+        old_path = (await self.db.get_subject_file(old_id))[1] if old_id is not None else None
+        old_hash = await self._file_hash(old_path) if old_path else None
+        
+        # Yangi fayl tayyor: ishlayotgan fayl atomik almashtiriladi
+        try:
+            os.replace(upload_path, file_path)
+            subject_id = await self.db.add_subject(subject_name, file_path)
+            if not subject_id:
+                raise RuntimeError("fan yozuvini saqlab bo'lmadi")
+            # Bank .qbank keshidan xaritalanadi, barqaror savol ID lari shu yerda beriladi
+            questions, bank_version = await self.questions_cache.load(subject_id, file_path)
+        except Exception as e:
+            logger.error(f"Fan faylini almashtirishda xatolik ({file_path}): {e}")
+            self._remove_upload(upload_path)
+            await context.bot.send_message(chat_id=admin_id, text=f"❌ '{subject_name}' fanini saqlashda xatolik yuz berdi!")
+            return
+        elapsed = time.perf_counter() - started
+        
+        if old_hash is not None and old_hash != await self._file_hash(file_path):
+            await self._remove_cache(old_hash)
+        
+        await self.db.mark_subject_ready(subject_id, len(questions))
+        text = (f"✅ '{subject_name}' fani muvaffaqiyatli qo'shildi!\n\n"
+                f"🔢 Savollar: {len(questions)} ta\n"
+                f"⏱ Tahlil vaqti: {elapsed:.2f} soniya")
+        
+        # Fan qayta yuklangan bo'lsa, o'zgarishlar soni ko'rsatiladi
+        changes = self.questions_cache.changes(subject_id)
+        if changes is not None and changes[0]:
+            kept, added, removed = changes
+            text += (f"\n\n🔁 O'zgarmagan: {kept} ta\n"
+                     f"➕ Yangi yoki tahrirlangan: {added} ta\n"
+                     f"➖ O'chirilgan: {removed} ta")
+        await context.bot.send_message(chat_id=admin_id, text=text)
+    
+    @staticmethod
+    def _remove_upload(upload_path: str):
+        try:
+            os.remove(upload_path)
+        except OSError:
+            pass
+    
+    @staticmethod
+    async def _file_hash(file_path: str):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, FileParser.file_sha256, file_path)
+        except OSError:
+            return None
+    
+    @staticmethod
+    async def _remove_cache(file_hash):
+        if file_hash is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, FileParser.remove_cache, file_hash)
+    
+    async def cache_stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Savollar keshidagi banklar, hajmi va murojaatlar statistikasi"""
+        user_id = update.message.from_user.id
+        
+        if not await self.is_admin(user_id):
+            await update.message.reply_text("❌ Siz admin emassiz!")
+            return
+        
+        cache = self.questions_cache
+        requests_total = cache.hits + cache.misses
+        hit_rate = cache.hits / requests_total * 100 if requests_total else 0
+        text = (
+            f"🗂 Savollar keshi: {cache.total_bytes / 1024:.0f} / {cache.max_bytes / 1024:.0f} KB\n"
+            f"🎯 Keshdan berildi: {cache.hits}/{requests_total} ({hit_rate:.1f}%)\n\n"
+        )
+        
+        entries = cache.stats()
+        if not entries:
+            text += "Kesh bo'sh."
+        for subject_id, count, nbytes, hits, loads in reversed(entries):
+            text += f"• Fan {subject_id}: {count} ta savol, {nbytes / 1024:.0f} KB, {hits} murojaat, {loads} yuklash\n"
+        
+        text += "\nTozalash: /cachepurge yoki /cachepurge [fan ID]"
+        await update.message.reply_text(text)
+    
+    async def cache_purge_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Savollar keshini (yoki bitta fan bankini) tozalash"""
+        user_id = update.message.from_user.id
+        
+        if not await self.is_admin(user_id):
+            await update.message.reply_text("❌ Siz admin emassiz!")
+            return
+        
+        if context.args:
+            try:
+                subject_id = int(context.args[0])
+            except ValueError:
+                await update.message.reply_text("❌ Iltimos, to'g'ri fan ID kiriting (raqam)!")
+                return
+            
+            if self.questions_cache.invalidate(subject_id):
+                await update.message.reply_text(f"✅ Fan {subject_id} banki keshdan o'chirildi.")
+            else:
+                await update.message.reply_text(f"ℹ️ Fan {subject_id} keshda yo'q.")
+        else:
+            count = self.questions_cache.purge()
+            await update.message.reply_text(f"✅ Kesh tozalandi: {count} ta bank o'chirildi.")
+    
     def get_handlers(self):
         return [
             CommandHandler("addsubject", self.add_subject_command),
             CommandHandler("addadmin", self.add_admin_command),
             CommandHandler("removeadmin", self.remove_admin_command),
+            CommandHandler("cache", self.cache_stats_command),
+            CommandHandler("cachepurge", self.cache_purge_command),
             MessageHandler(filters.Document.ALL, self.handle_admin_document)
         ]
\ No newline at end of file
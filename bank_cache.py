@@ -0,0 +1,141 @@
+import os
+import logging
+from collections import OrderedDict
+from config import QUESTIONS_CACHE_BYTES
+from bank_loader import BankLoader
+from database import AsyncDatabaseManager
+from question_bank import StableQuestionView, assign_question_ids
+
+logger = logging.getLogger(__name__)
+
+class _CachedBank:
+    __slots__ = ('bank', 'version', 'file_path', 'signature', 'nbytes', 'hits', 'loads', 'changes')
+    
+    def __init__(self, bank, version, file_path, signature, changes):
+        self.bank = bank
+        self.version = version
+        self.file_path = file_path
+        self.signature = signature
+        self.nbytes = bank.nbytes
+        self.hits = 0
+        self.loads = 1
+        self.changes = changes
+
+class BankCache:
+    """Yuklangan savollar banklari uchun hajmi cheklangan LRU kesh.
+
+    Yozuv fan fayli (yo'l, hajm, o'zgarish vaqti) ga bog'lanadi: fayl
+    almashtirilsa yoki shu fayl boshqa fan id bilan qayta yuklansa, eski bank
+    keshdan chiqariladi. Umumiy hajm max_bytes dan oshsa, eng uzoq
+    ishlatilmagan banklar chiqariladi.
+    
+    Bank savollariga barqaror ID orqali murojaat qilinadi (StableQuestionView):
+    fayl qayta yuklanganda yangi savollar xeshlari oldingilari bilan
+    solishtiriladi va o'zgarmagan savollar eski ID sini saqlaydi.
+    """
+    
+    def __init__(self, loader: BankLoader, db: AsyncDatabaseManager, max_bytes: int = QUESTIONS_CACHE_BYTES):
+        self.loader = loader
+        self.db = db
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+    
+    @staticmethod
+    def file_signature(file_path: str):
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns
+    
+    async def load(self, subject_id: int, file_path: str):
+        """(savollar, bank_versiyasi) ni keshdan yoki fayldan olish"""
+        signature = self.file_signature(file_path)
+        entry = self._entries.get(subject_id)
+        if entry is not None and entry.file_path == file_path and entry.signature == signature:
+            self._entries.move_to_end(subject_id)
+            entry.hits += 1
+            self.hits += 1
+            return entry.bank, entry.version
+        
+        self.misses += 1
+        bank, version = await self.loader.load(subject_id, file_path)
+        ids, changes = await self._question_ids(subject_id, bank, version)
+        bank = StableQuestionView(bank, ids)
+        
+        # Kutish paytida boshqa so'rov yangilagan bo'lishi mumkin
+        entry = self._entries.get(subject_id)
+        loads = entry.loads + 1 if entry is not None else 1
+        self.invalidate(subject_id)
+        for stale_id in [key for key, cached in self._entries.items() if cached.file_path == file_path]:
+            self.invalidate(stale_id)
+        
+        entry = _CachedBank(bank, version, file_path, signature, changes)
+        entry.loads = loads
+        self._entries[subject_id] = entry
+        self.total_bytes += entry.nbytes
+        self._evict_overflow()
+        return bank, version
+    
+    def cached(self, subject_id: int, source):
+        """(savollar, bank_versiyasi) ni faylni tekshirmasdan olish; manba (yo'l, imzo) boshqa bo'lsa None"""
+        entry = self._entries.get(subject_id)
+        if entry is None or (entry.file_path, entry.signature) != source:
+            return None
+        self._entries.move_to_end(subject_id)
+        entry.hits += 1
+        self.hits += 1
+        return entry.bank, entry.version
+    
+    def source(self, subject_id: int):
+        """Keshdagi bank manbai (yo'l, imzo) yoki None"""
+        entry = self._entries.get(subject_id)
+        return (entry.file_path, entry.signature) if entry is not None else None
+    
+    async def _question_ids(self, subject_id, bank, version):
+        stored_version, previous = await self.db.get_subject_questions(subject_id)
+        if stored_version == version and len(previous) == len(bank):
+            return [question_id for question_id, _ in previous], None
+        
+        # Faqat mazmuni o'zgargan savollar yangi ID oladi
+        hashes = bank.content_hashes()
+        ids, kept = assign_question_ids(previous, hashes)
+        await self.db.save_subject_questions(subject_id, version, list(zip(ids, hashes)))
+        changes = (kept, len(ids) - kept, len(previous) - kept)
+        logger.info(f"Fan {subject_id} savollari yangilandi: {changes[0]} o'zgarmagan, "
+                    f"{changes[1]} yangi, {changes[2]} o'chirilgan")
+        return ids, changes
+    
+    def changes(self, subject_id: int):
+        """Oxirgi yuklashdagi (o'zgarmagan, yangi, o'chirilgan) savollar soni yoki None"""
+        entry = self._entries.get(subject_id)
+        return entry.changes if entry is not None else None
+    
+    def _evict_overflow(self):
+        # Oxirgi (hozir yuklangan) bank budjetdan katta bo'lsa ham saqlanadi
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            subject_id, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry.nbytes
+            logger.info(f"Fan {subject_id} banki keshdan chiqarildi ({entry.nbytes} bayt)")
+    
+    def invalidate(self, subject_id: int) -> bool:
+        """Fan bankini keshdan chiqarish"""
+        entry = self._entries.pop(subject_id, None)
+        if entry is None:
+            return False
+        self.total_bytes -= entry.nbytes
+        return True
+    
+    def purge(self) -> int:
+        """Barcha banklarni keshdan chiqarish, chiqarilganlar sonini qaytaradi"""
+        count = len(self._entries)
+        self._entries.clear()
+        self.total_bytes = 0
+        return count
+    
+    def stats(self) -> list:
+        """Keshdagi yozuvlar: (fan id, savollar soni, bayt, murojaatlar, yuklashlar), LRU tartibida"""
+        return [
+            (subject_id, len(entry.bank), entry.nbytes, entry.hits, entry.loads)
+            for subject_id, entry in self._entries.items()
+        ]
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import signal
+import asyncio
+import logging
+from config import PARSER_WORKERS, PARSER_TIMEOUT
+from file_parser import FileParser
+from question_bank import QuestionBank, MappedQuestionBank
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_worker.py')
+
+class ParserError(Exception):
+    """Faylni tahlil qilib bo'lmadi (sababi adminga ko'rsatiladi)"""
+
+class BankLoader:
+    """Savollar bankini event loop'dan tashqarida, alohida jarayonda yuklash.
+
+    Tahlil har fayl uchun cheklangan jarayonda (parser_worker.py) bajariladi:
+    vaqt chegarasi oshsa jarayon o'ldiriladi, xotira va arxiv hajmi chegarasi
+    jarayon ichida qo'yiladi. Bir xil kalit (fan) uchun bir vaqtda kelgan
+    so'rovlar bitta yuklashning natijasini kutadi.
+    """
+    
+    def __init__(self, workers: int = PARSER_WORKERS, timeout: float = PARSER_TIMEOUT):
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(workers)
+        self._inflight = {}
+        self._processes = set()
+    
+    async def load(self, key, file_path: str):
+        """(savollar, bank_versiyasi) ni qaytarish"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compile(file_path))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        else:
+            logger.info(f"{key} uchun yuklash allaqachon bajarilmoqda, natija kutilmoqda")
+        
+        # Bitta kutuvchi bekor qilinsa, umumiy yuklash to'xtamasligi kerak
+        return await asyncio.shield(task)
+    
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+    
+    async def _compile(self, file_path: str):
+        # Tayyor .qbank bo'lsa, jarayon ishga tushirilmaydi
+        loop = asyncio.get_running_loop()
+        bank_path = await loop.run_in_executor(None, FileParser.cache_path, file_path)
+        if os.path.exists(bank_path):
+            try:
+                return self._map(bank_path)
+            except Exception as e:
+                logger.warning(f"Bank faylini ochib bo'lmadi ({bank_path}): {e}")
+        
+        async with self._slots:
+            result = await self._run_worker(file_path)
+        if 'error' in result:
+            raise ParserError(result['error'])
+        if 'bank_path' in result:
+            return self._map(result['bank_path'])
+        return QuestionBank(result['questions']), result['version']
+    
+    @staticmethod
+    def _map(bank_path: str):
+        # Bank fayli xaritalanadi: jarayonlar bitta sahifa keshini bo'lishadi
+        bank = MappedQuestionBank(bank_path)
+        return bank, bank.version
+    
+    async def _run_worker(self, file_path: str) -> dict:
+        # POSIX'da alohida jarayon guruhi: PDF tahlilidagi ichki jarayonlar ham to'xtatiladi
+        options = {'start_new_session': True} if os.name == 'posix' else {}
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, WORKER_SCRIPT, file_path,
+            stdout=asyncio.subprocess.PIPE, **options
+        )
+        self._processes.add(process)
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            self._kill(process)
+            await process.wait()
+            logger.error(f"Tahlil vaqti tugadi ({self.timeout} s): {file_path}")
+            raise ParserError(f"tahlil {self.timeout:g} soniyada tugamadi")
+        except asyncio.CancelledError:
+            self._kill(process)
+            raise
+        finally:
+            self._processes.discard(process)
+        
+        if process.returncode != 0:
+            logger.error(f"Tahlil jarayoni {process.returncode} kodi bilan to'xtadi: {file_path}")
+            raise ParserError(f"tahlil jarayoni to'xtab qoldi (kod {process.returncode}), "
+                              f"ehtimol xotira chegarasi oshdi")
+        try:
+            return json.loads(stdout)
+        except ValueError:
+            raise ParserError("tahlil jarayoni noto'g'ri javob qaytardi")
+    
+    @staticmethod
+    def _kill(process):
+        if process.returncode is not None:
+            return
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+    
+    def close(self):
+        for process in list(self._processes):
+            self._kill(process)
@@ -0,0 +1,273 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import zipfile
+import platform
+import argparse
+import logging
+import tempfile
+import subprocess
+from xml.sax.saxutils import escape
+import database
+import file_parser
+from database import DatabaseManager
+from file_parser import FileParser, LINE_OPTION, LINE_QUESTION
+
+LATIN_WORDS = ["din", "falsafa", "tarix", "madaniyat", "ta'limot", "jamiyat", "qadriyat", "e'tiqod"]
+CYRILLIC_WORDS = ["дин", "фалсафа", "тарих", "маданият", "таълимот", "жамият", "қадрият", "эътиқод"]
+
+def generate_paragraphs(questions: int, seed: int = 1, latin_only: bool = False):
+    """Sintetik savollar paragraflari: raqamli savollar, A)-D) variantlar, ba'zan ko'p qatorli.
+    
+    Har paragraf - qatorlar ro'yxati (Word'da bitta paragraf ichidagi qator
+    ko'chirishlari); kirill va lotin matnli savollar navbatlashadi.
+    """
+    rng = random.Random(seed)
+    for number in range(1, questions + 1):
+        words = CYRILLIC_WORDS if number % 2 and not latin_only else LATIN_WORDS
+        yield [f"{number}. " + " ".join(rng.choice(words) for _ in range(rng.randint(5, 14))) + "?"]
+        if number % 10 == 0:
+            yield [" ".join(rng.choice(words) for _ in range(8))]
+        for letter in "ABCD":
+            option = [f"{letter}) " + " ".join(rng.choice(words) for _ in range(rng.randint(1, 6)))]
+            if number % 7 == 0:
+                option.append(" ".join(rng.choice(words) for _ in range(4)))
+            yield option
+
+def generate_text_bank(questions: int, seed: int = 1) -> str:
+    """Sintetik test matni (generate_paragraphs qatorlari)"""
+    return "\n".join(line for paragraph in generate_paragraphs(questions, seed) for line in paragraph)
+
+def generate_docx_bank(path: str, questions: int, seed: int = 1):
+    """Sintetik .docx: ko'p qatorli variantlar bitta paragraf ichida <w:br/> bilan"""
+    body = []
+    for paragraph in generate_paragraphs(questions, seed):
+        runs = '<w:br/>'.join(f'<w:t xml:space="preserve">{escape(line)}</w:t>' for line in paragraph)
+        body.append(f'<w:p><w:r>{runs}</w:r></w:p>')
+    
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{"".join(body)}</w:body></w:document>'
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'
+    )
+    relationships = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="word/document.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    )
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', content_types)
+        archive.writestr('_rels/.rels', relationships)
+        archive.writestr('word/document.xml', document)
+
+def generate_pdf_bank(path: str, questions: int, seed: int = 1, lines_per_page: int = 60):
+    """Sintetik PDF (standart Helvetica shrifti kirillni bilmaydi - faqat lotin matni)"""
+    lines = [line for paragraph in generate_paragraphs(questions, seed, latin_only=True) for line in paragraph]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+    
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>", b""]
+    kids = []
+    for page in pages:
+        escaped = [line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') for line in page]
+        stream = ("BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({line}) '" for line in escaped) + " ET").encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 1 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+def _legacy_classify(line: str):
+    """Oldingi usul: har qatorda regex satrlari ro'yxatini aylanib chiqish"""
+    if len(line) >= 3:
+        for pattern in [r'^\d+[\.\)]', r'^\d+\.\s', r'^\d+\)\s', r'^«', r'^\d+\s*\.']:
+            if re.match(pattern, line):
+                return LINE_QUESTION, line
+        if line[0].isdigit() and len(line) < 100:
+            return LINE_QUESTION, line
+    if len(line) >= 2:
+        for pattern in [r'^[A-Da-d][\.\)]', r'^[A-Da-d]\.', r'^[A-Da-d]\s']:
+            if re.match(pattern, line):
+                text = line
+                for remove in [r'^[A-Da-d][\.\)]\s*', r'^[A-Da-d]\s+']:
+                    text = re.sub(remove, '', text).strip()
+                return LINE_OPTION, text if len(text) >= 2 else ""
+    return None, line
+
+def _time_per_line(func, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for line in lines:
+            func(line)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(lines) * 1e9
+
+def bench_classifier(questions: int, repeat: int, results):
+    lines = [line.strip() for line in generate_text_bank(questions).split('\n') if line.strip()]
+    # Ikkala usul navbatma-navbat o'lchanadi: mashina yuklamasi ikkalasiga teng ta'sir qiladi
+    timings = {'classify_legacy': [], 'classify_line': []}
+    for _ in range(repeat):
+        for name, func in (('classify_legacy', _legacy_classify), ('classify_line', FileParser.classify_line)):
+            timings[name].append(_time_per_line(func, lines, 1) * len(lines) / 1e9)
+    print(f"Qatorlar: {len(lines)} ({questions} ta savol), Python {platform.python_version()}, "
+          f"{repeat} takrorning eng yaxshisi")
+    
+    best = {name: min(values) for name, values in timings.items()}
+    speedup = round(best['classify_legacy'] / best['classify_line'], 2)
+    for name, values in timings.items():
+        extra = {'questions': questions}
+        if name == 'classify_line':
+            extra['speedup'] = speedup
+        _record(results, name, len(lines), best[name], sum(values) / len(values), **extra)
+    print(f"classify_line tezlashuvi: {speedup}x")
+
+def _time_call(func, repeat):
+    """Eng yaxshi va o'rtacha vaqt (soniya) hamda oxirgi natija"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), sum(timings) / len(timings), result
+
+def _record(results, name, size, best, mean, **extra):
+    entry = {'name': name, 'size': size, 'best_s': round(best, 6), 'mean_s': round(mean, 6),
+             'per_item_us': round(best / size * 1e6, 3) if size else None}
+    entry.update(extra)
+    results.append(entry)
+    print(f"{name:<28} {size:>7}  {best * 1000:10.2f} ms  ({entry['per_item_us']} us/birlik)")
+
+def bench_parsers(sizes, repeat, workdir, results):
+    """FileParser metodlari: parse_docx, parse_docx_advanced, parse_pdf, parse_text, validate_questions"""
+    cache_folder = os.path.join(workdir, 'cache')
+    # Sahifalar keshi vaqtinchalik papkada, har o'lchovdan oldin tozalanadi
+    file_parser.BANK_CACHE_FOLDER = cache_folder
+    
+    def cold_pdf(path):
+        for name in os.listdir(cache_folder) if os.path.isdir(cache_folder) else []:
+            os.remove(os.path.join(cache_folder, name))
+        return FileParser.parse_pdf(path)
+    
+    for size in sizes:
+        docx_path = os.path.join(workdir, f'bank_{size}.docx')
+        pdf_path = os.path.join(workdir, f'bank_{size}.pdf')
+        generate_docx_bank(docx_path, size)
+        generate_pdf_bank(pdf_path, size)
+        text = generate_text_bank(size)
+        
+        for name, func in (
+            ('parse_docx', lambda: FileParser.parse_docx(docx_path)),
+            ('parse_docx_advanced', lambda: FileParser.parse_docx_advanced(docx_path)),
+            ('parse_pdf', lambda: cold_pdf(pdf_path)),
+            ('parse_text', lambda: FileParser.parse_text(text)),
+        ):
+            best, mean, questions = _time_call(func, repeat)
+            _record(results, name, size, best, mean, found=len(questions))
+        
+        questions = FileParser.parse_text(text)
+        best, mean, validated = _time_call(lambda: FileParser.validate_questions(questions), repeat)
+        _record(results, 'validate_questions', size, best, mean, found=len(validated))
+
+def bench_sessions(sizes, repeat, workdir, results):
+    """DatabaseManager: sessiyani saqlash/o'qish va javoblar checkpoint'i (savollar soni bo'yicha)"""
+    database.DATABASE_NAME = os.path.join(workdir, 'bench.db')
+    db = DatabaseManager()
+    rng = random.Random(1)
+    try:
+        for size in sizes:
+            question_ids = rng.sample(range(size * 2), size)
+            answers = [(i, question_ids[i], rng.randrange(4), rng.random() < 0.5) for i in range(size)]
+            
+            best, mean, _ = _time_call(lambda: db.save_user_session(
+                1, size, 1, 'bench', question_ids, rng.getrandbits(63), 0, 0, size), repeat)
+            _record(results, 'save_user_session', size, best, mean)
+            
+            best, mean, _ = _time_call(lambda: db.get_user_session(1, size), repeat)
+            _record(results, 'get_user_session', size, best, mean)
+            
+            def checkpoint():
+                db.conn.execute('DELETE FROM session_answers WHERE session_id = ?', (size,))
+                db.checkpoint_session(1, size, size, size, size // 2, answers)
+            best, mean, _ = _time_call(checkpoint, repeat)
+            _record(results, 'checkpoint_session', size, best, mean)
+            
+            best, mean, _ = _time_call(lambda: db.get_session_answers(size), repeat)
+            _record(results, 'get_session_answers', size, best, mean)
+    finally:
+        db.close()
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FileParser va sessiyalar benchmarklari")
+    parser.add_argument('--questions', type=int, default=10000, help="tasniflash benchmarki uchun savollar soni")
+    parser.add_argument('--sizes', default='100,1000,10000',
+                        help="parser va sessiya benchmarklari uchun o'lchamlar (vergul bilan, 100000 gacha)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', choices=['classifier', 'parsers', 'sessions'], action='append',
+                        help="faqat tanlangan benchmarklar (bir necha marta berish mumkin)")
+    parser.add_argument('--output', help="natijalarni JSON faylga yozish (commit'lar orasida solishtirish uchun)")
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+    
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    only = set(args.only or ['classifier', 'parsers', 'sessions'])
+    results = []
+    
+    if 'classifier' in only:
+        bench_classifier(args.questions, args.repeat, results)
+    with tempfile.TemporaryDirectory() as workdir:
+        if 'parsers' in only:
+            bench_parsers(sizes, args.repeat, workdir, results)
+        if 'sessions' in only:
+            bench_sessions(sizes, args.repeat, workdir, results)
+    
+    if args.output:
+        report = {
+            'commit': _git_commit(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Natijalar yozildi: {args.output}")
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,12 +1,17 @@
 import os
 import logging
+from telegram import Update
 from telegram.ext import Application, CommandHandler
 from config import BOT_TOKEN, SUBJECTS_FOLDER
-from database import DatabaseManager
+from database import DatabaseManager, AsyncDatabaseManager
+from bank_loader import BankLoader
+from bank_cache import BankCache
 from admin_handlers import AdminHandlers
 from user_handlers import UserHandlers
+from group_quiz import GroupQuizHandlers
+from webapp import WebAppServer
 from callback_handlers import CallbackHandlers
-from config import ADMIN_ID
+from config import ADMIN_ID, WEBAPP_URL
 
 # Log konfiguratsiyasi
 logging.basicConfig(
@@ -20,13 +25,39 @@ def main():
     os.makedirs(SUBJECTS_FOLDER, exist_ok=True)
     
     # Ma'lumotlar bazasi va handlerlarni yaratish
-    db = DatabaseManager()
-    admin_handlers = AdminHandlers(db)
-    user_handlers = UserHandlers(db)
-    callback_handlers = CallbackHandlers(db, admin_handlers, user_handlers)
+    db = AsyncDatabaseManager(DatabaseManager())
+    bank_loader = BankLoader()
+    questions_cache = BankCache(bank_loader, db)
+    admin_handlers = AdminHandlers(db, questions_cache)
+    user_handlers = UserHandlers(db, questions_cache)
+    group_handlers = GroupQuizHandlers(db, questions_cache)
+    callback_handlers = CallbackHandlers(db, admin_handlers, user_handlers, group_handlers)
+    # Mini App rejimi faqat WEBAPP_URL berilganda yoqiladi
+    webapp_server = WebAppServer(user_handlers) if WEBAPP_URL else None
+    
+    async def post_init(application):
+        await admin_handlers.ensure_main_admin()
+        await user_handlers.migrate_legacy_sessions()
+        user_handlers.sessions.start_checkpointer()
+        if webapp_server is not None:
+            await webapp_server.start(application)
+    
+    async def post_shutdown(application):
+        if webapp_server is not None:
+            await webapp_server.close()
+        # Keshdagi sessiyalarni yozib, navbatdagi yozuvlarni commit qilish
+        await user_handlers.sessions.close()
+        db.close()
+        bank_loader.close()
     
     # Application
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # Handlerslarni qo'shish
     application.add_handler(CommandHandler("start", user_handlers.user_start))
@@ -39,13 +70,18 @@ def main():
     for handler in user_handlers.get_handlers():
         application.add_handler(handler)
     
+    # Guruh viktorinasi handlerlari
+    for handler in group_handlers.get_handlers():
+        application.add_handler(handler)
+    
     # Callback handlerlari
     for handler in callback_handlers.get_handlers():
         application.add_handler(handler)
     
     print("Bot ishga tushdi...")
     print(f"Admin ID: {ADMIN_ID}")
-    application.run_polling()
+    # Viktorina rejimi uchun poll_answer yangilanishlari ham kerak
+    application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
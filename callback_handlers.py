@@ -1,17 +1,21 @@
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CallbackQueryHandler
-from database import DatabaseManager
+from database import AsyncDatabaseManager
 from admin_handlers import AdminHandlers
 from user_handlers import UserHandlers
+from group_quiz import GroupQuizHandlers
+from callback_signer import ANSWER_PREFIX, PAGE_PREFIX
 
 logger = logging.getLogger(__name__)
 
 class CallbackHandlers:
-    def __init__(self, db: DatabaseManager, admin_handlers: AdminHandlers, user_handlers: UserHandlers):
+    def __init__(self, db: AsyncDatabaseManager, admin_handlers: AdminHandlers, user_handlers: UserHandlers,
+                 group_handlers: GroupQuizHandlers):
         self.db = db
         self.admin_handlers = admin_handlers
         self.user_handlers = user_handlers
+        self.group_handlers = group_handlers
     
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
@@ -26,7 +30,7 @@ class CallbackHandlers:
                 await query.edit_message_text(
                     "📁 Yangi fan qo'shish uchun:\n"
                     "1. Fan nomini kiriting: /addsubject [Fan nomi]\n"
-                    "2. So'ngra Word yoki PDF fayl yuboring"
+                    "2. So'ngra Word, PDF yoki jadval (CSV, TSV, JSONL) fayl yuboring"
                 )
             elif data == "admin_management":
                 await self.admin_handlers.admin_management(update, context)
@@ -50,10 +54,20 @@ class CallbackHandlers:
                 await self.user_handlers.show_subjects(update, context)
             elif data.startswith("subject_"):
                 await self.user_handlers.handle_subject_selection(update, context)
+            elif data.startswith("mode_"):
+                await self.user_handlers.handle_mode_selection(update, context)
             elif data.startswith("count_"):
                 await self.user_handlers.handle_question_count(update, context)
-            elif data.startswith("ans_"):
+            elif data.startswith(ANSWER_PREFIX):
                 await self.user_handlers.handle_answer(update, context)
+            elif data.startswith(PAGE_PREFIX):
+                await self.user_handlers.handle_page_pick(update, context)
+            elif data.startswith("pagesubmit_"):
+                await self.user_handlers.handle_page_submit(update, context)
+            elif data.startswith("g_"):
+                await self.group_handlers.handle_answer(update, context)
+            elif data.startswith("gnext_"):
+                await self.group_handlers.handle_next(update, context)
             elif data.startswith("next_"):
                 await self.user_handlers.handle_next_question(update, context)
             else:
@@ -68,7 +82,7 @@ class CallbackHandlers:
         user_id = query.from_user.id
         user_name = query.from_user.first_name
         
-        if self.admin_handlers.is_admin(user_id):
+        if await self.admin_handlers.is_admin(user_id):
             keyboard = [
                 [InlineKeyboardButton("📁 Fan qo'shish", callback_data="admin_add_subject")],
                 [InlineKeyboardButton("👥 Adminlar", callback_data="admin_management")],
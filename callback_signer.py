@@ -0,0 +1,72 @@
+import hmac
+import base64
+import struct
+import hashlib
+from collections import OrderedDict
+from config import CALLBACK_SECRET
+
+# Javob tugmasi: "a:" + base64url(fan, sessiya nonce'i, savol, variant + 8 baytli HMAC)
+ANSWER_PREFIX = "a:"
+# Sahifali rejimdagi variant tanlash tugmasi (xuddi shu tuzilma, boshqa imzo)
+PAGE_PREFIX = "p:"
+_KINDS = {ANSWER_PREFIX: b'', PAGE_PREFIX: b'p'}
+_ANSWER = struct.Struct('<IIIB')
+_TAG_SIZE = 8
+
+def session_nonce(session_id: int) -> int:
+    """Tugmalarga yoziladigan qisqa sessiya belgisi (session_id ning quyi 32 biti)"""
+    return session_id & 0xFFFFFFFF
+
+class CallbackSigner:
+    """Javob tugmalari uchun imzolangan ixcham callback_data.
+
+    Imzo foydalanuvchi ID siga bog'langan: boshqa foydalanuvchi tugmasini yoki
+    qo'lda yasalgan ma'lumotni bazaga murojaatsiz rad etish mumkin. To'g'ri
+    javob tugmada saqlanmaydi.
+    """
+    
+    def __init__(self, secret: str = CALLBACK_SECRET):
+        self._key = hmac.new(secret.encode('utf-8'), b'callback-data', hashlib.sha256).digest()
+    
+    def _tag(self, user_id: int, payload: bytes, kind: bytes = b'') -> bytes:
+        message = struct.pack('<q', user_id) + kind + payload
+        return hmac.new(self._key, message, hashlib.sha256).digest()[:_TAG_SIZE]
+    
+    def encode_answer(self, user_id: int, subject_id: int, nonce: int, question_index: int, choice: int,
+                      prefix: str = ANSWER_PREFIX) -> str:
+        payload = _ANSWER.pack(subject_id, nonce, question_index, choice)
+        token = base64.urlsafe_b64encode(payload + self._tag(user_id, payload, _KINDS[prefix])).rstrip(b'=')
+        return prefix + token.decode('ascii')
+    
+    def decode_answer(self, user_id: int, data: str, prefix: str = ANSWER_PREFIX):
+        """(fan, nonce, savol, variant) yoki imzo noto'g'ri bo'lsa None"""
+        try:
+            token = data[len(prefix):]
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        except (ValueError, TypeError):
+            return None
+        if len(raw) != _ANSWER.size + _TAG_SIZE:
+            return None
+        payload, tag = raw[:_ANSWER.size], raw[_ANSWER.size:]
+        if not hmac.compare_digest(tag, self._tag(user_id, payload, _KINDS[prefix])):
+            return None
+        return _ANSWER.unpack(payload)
+
+class ReplayGuard:
+    """Yaqinda qabul qilingan tugmalar (qayta bosishni xotirada rad etish uchun)"""
+    
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._seen = OrderedDict()
+    
+    def check_and_add(self, key) -> bool:
+        """Kalit yangi bo'lsa True (va eslab qoladi), avval ko'rilgan bo'lsa False"""
+        if key in self._seen:
+            return False
+        self._seen[key] = None
+        if len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return True
+    
+    def discard(self, key):
+        self._seen.pop(key, None)
@@ -4,6 +4,47 @@ ADMIN_ID = 6313092609
 
 # Ma'lumotlar bazasi
 DATABASE_NAME = "test_bot.db"
+DB_READER_THREADS = 4
+
+# Javob tugmalarini imzolash kaliti (standart: bot tokeni)
+CALLBACK_SECRET = BOT_TOKEN
+
+# Guruhli commit: yozuvlar shu oyna (soniya) ichida yoki N tagacha yig'iladi
+DB_BATCH_WINDOW = 0.005
+DB_BATCH_MAX = 200
+
+# Faol sessiyalar keshi
+SESSION_CACHE_SIZE = 10000
+SESSION_CHECKPOINT_EVERY = 5      # har k ta javobdan keyin bazaga yozish
+SESSION_IDLE_TIMEOUT = 300        # shuncha soniya harakatsiz sessiya bazaga qaytariladi
+SESSION_CHECKPOINT_INTERVAL = 30  # harakatsiz sessiyalarni tekshirish oralig'i
+
+# Sahifali rejim: bitta xabardagi savollar soni va matn chegarasi
+QUESTIONS_PER_PAGE = 5
+PAGE_TEXT_LIMIT = 3500
+
+# Guruh viktorinasi: reyting xabarini yangilash oralig'i va ko'rsatiladigan o'rinlar
+GROUP_LEADERBOARD_INTERVAL = 3  # soniya
+GROUP_LEADERBOARD_TOP = 10
+
+# Mini App rejimi: WEBAPP_URL - ichki HTTP serverga yo'naltirilgan ochiq HTTPS manzil (bo'sh bo'lsa o'chirilgan)
+WEBAPP_URL = ""
+WEBAPP_HOST = "0.0.0.0"
+WEBAPP_PORT = 8080
+WEBAPP_INIT_DATA_MAX_AGE = 24 * 3600  # soniya
 
 # Papkalar
-SUBJECTS_FOLDER = "subjects"
\ No newline at end of file
+SUBJECTS_FOLDER = "subjects"
+
+# Tahlil qilingan savollar keshi (manba fayl xeshi bo'yicha)
+BANK_CACHE_FOLDER = "subjects/.cache"
+PARSER_WORKERS = 2
+PDF_PAGES_PER_WORKER = 25
+
+# Fayl tahlili alohida jarayonda: vaqt, xotira va arxiv hajmi chegaralari
+PARSER_TIMEOUT = 120  # soniya
+PARSER_MEMORY_LIMIT = 1024 * 1024 * 1024  # bayt (faqat Linux/macOS)
+PARSER_MAX_UNZIPPED_BYTES = 200 * 1024 * 1024  # .docx ichidagi fayllar jami hajmi
+
+# Xotiradagi savollar banklari keshi uchun hajm chegarasi (baytlarda)
+QUESTIONS_CACHE_BYTES = 64 * 1024 * 1024
\ No newline at end of file
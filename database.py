@@ -1,15 +1,46 @@
 import sqlite3
 import json
+import time
+import queue
+import random
+import atexit
+import asyncio
 import logging
-from config import DATABASE_NAME
+import threading
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from config import DATABASE_NAME, DB_READER_THREADS, DB_BATCH_WINDOW, DB_BATCH_MAX
 
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
     def __init__(self):
-        self.conn = sqlite3.connect(DATABASE_NAME, check_same_thread=False)
+        # Har bir oqim o'z ulanishiga ega bo'ladi
+        self._local = threading.local()
         self.create_tables()
     
+    @property
+    def conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(DATABASE_NAME, timeout=30)
+            # WAL rejimida o'qishlar yozuvni kutmaydi
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def commit(self):
+        # Guruhli yozuv ichida commit'ni WriteBatcher o'zi bajaradi
+        if not getattr(self._local, 'in_batch', False):
+            self.conn.commit()
+    
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
     def create_tables(self):
         # Adminlar jadvali
         self.conn.execute('''
@@ -29,21 +60,59 @@ class DatabaseManager:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        # Mavjud fanlar tayyor hisoblanadi, yangilari savollar tahlil qilingach ko'rinadi
+        self.ensure_column('subjects', 'ready', 'INTEGER DEFAULT 1')
+        self.ensure_column('subjects', 'question_count', 'INTEGER')
+        self.ensure_column('subjects', 'bank_version', 'TEXT')
         
-        # Foydalanuvchi sessiyalari
+        # Fan savollarining barqaror ID lari (bankdagi o'rni bo'yicha)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS subject_questions (
+                subject_id INTEGER,
+                position INTEGER,
+                question_id INTEGER,
+                content_hash BLOB,
+                PRIMARY KEY (subject_id, position)
+            )
+        ''')
+        
+        # Eski formatdagi sessiyalarni chetga olib qo'yish
+        self.migrate_user_sessions()
+        
+        # Foydalanuvchi sessiyalari (savollar bankiga havolalar ko'rinishida)
         self.conn.execute('''
             CREATE TABLE IF NOT EXISTS user_sessions (
                 user_id INTEGER,
                 subject_id INTEGER,
-                questions TEXT,
+                session_id INTEGER,
+                bank_version TEXT,
+                question_ids TEXT,
+                permutations TEXT,
                 current_question INTEGER,
-                answers TEXT,
                 score INTEGER,
                 total_questions INTEGER,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 PRIMARY KEY (user_id, subject_id)
             )
         ''')
+        self.ensure_column('user_sessions', 'session_id', 'INTEGER')
+        # Variantlar tartibi (seed, savol o'rni) dan hisoblanadi; permutations faqat eski sessiyalarda
+        self.ensure_column('user_sessions', 'seed', 'INTEGER')
+        self.ensure_column('user_sessions', 'mode', "TEXT DEFAULT 'classic'")
+        
+        # Javoblar jurnali (har bir javob - bitta qator)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS session_answers (
+                session_id INTEGER,
+                question_index INTEGER,
+                question_id INTEGER,
+                selected INTEGER,
+                correct INTEGER,
+                answered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (session_id, question_index)
+            )
+        ''')
+        self.migrate_session_answers()
         
         # Natijalar
         self.conn.execute('''
@@ -58,9 +127,16 @@ class DatabaseManager:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        self.ensure_column('results', 'session_id', 'INTEGER')
         
         self.conn.commit()
     
+    def ensure_column(self, table, column, column_type):
+        """Eski bazalarga yangi ustunni qo'shish"""
+        columns = [row[1] for row in self.conn.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            self.conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+    
     def is_admin(self, user_id):
         cursor = self.conn.execute('SELECT 1 FROM admins WHERE user_id = ?', (user_id,))
         return cursor.fetchone() is not None
@@ -68,7 +144,7 @@ class DatabaseManager:
     def add_admin(self, user_id, username):
         try:
             self.conn.execute('INSERT OR IGNORE INTO admins (user_id, username) VALUES (?, ?)', (user_id, username))
-            self.conn.commit()
+            self.commit()
             return True
         except Exception as e:
             logger.error(f"Admin qo'shishda xatolik: {e}")
@@ -77,7 +153,7 @@ class DatabaseManager:
     def remove_admin(self, user_id):
         try:
             self.conn.execute('DELETE FROM admins WHERE user_id = ?', (user_id,))
-            self.conn.commit()
+            self.commit()
             return True
         except Exception as e:
             logger.error(f"Admin o'chirishda xatolik: {e}")
@@ -88,59 +164,471 @@ class DatabaseManager:
         return cursor.fetchall()
     
     def add_subject(self, name, file_path):
+        """Fanni qo'shish yoki mavjud fan faylini yangilash. Fan ID sini qaytaradi.
+        
+        Yangi fan savollar tayyor bo'lguncha yashirin; qayta yuklangan fan esa
+        o'z ID sini va ko'rinishini saqlaydi.
+        """
         try:
             self.conn.execute(
-                'INSERT OR REPLACE INTO subjects (name, file_path) VALUES (?, ?)',
+                'INSERT INTO subjects (name, file_path, ready) VALUES (?, ?, 0) '
+                'ON CONFLICT(name) DO UPDATE SET file_path = excluded.file_path',
                 (name, file_path)
             )
-            self.conn.commit()
-            return True
+            self.commit()
+            cursor = self.conn.execute('SELECT id FROM subjects WHERE name = ?', (name,))
+            return cursor.fetchone()[0]
         except Exception as e:
             logger.error(f"Fanni qo'shishda xatolik: {e}")
-            return False
+            return None
+    
+    def mark_subject_ready(self, subject_id, question_count):
+        self.conn.execute(
+            'UPDATE subjects SET ready = 1, question_count = ? WHERE id = ?',
+            (question_count, subject_id)
+        )
+        self.commit()
+    
+    def get_subject_questions(self, subject_id):
+        """Fan bankining versiyasi va (question_id, content_hash) ro'yxati (o'rni bo'yicha)"""
+        row = self.conn.execute('SELECT bank_version FROM subjects WHERE id = ?', (subject_id,)).fetchone()
+        cursor = self.conn.execute(
+            'SELECT question_id, content_hash FROM subject_questions WHERE subject_id = ? ORDER BY position',
+            (subject_id,)
+        )
+        return (row[0] if row else None), [(question_id, bytes(content_hash)) for question_id, content_hash in cursor]
+    
+    def save_subject_questions(self, subject_id, bank_version, questions):
+        """Fan bankidagi savollar ID larini (question_id, content_hash) yangilash"""
+        self.conn.execute('DELETE FROM subject_questions WHERE subject_id = ?', (subject_id,))
+        self.conn.executemany(
+            'INSERT INTO subject_questions (subject_id, position, question_id, content_hash) VALUES (?, ?, ?, ?)',
+            [(subject_id, position, question_id, content_hash)
+             for position, (question_id, content_hash) in enumerate(questions)]
+        )
+        self.conn.execute('UPDATE subjects SET bank_version = ? WHERE id = ?', (bank_version, subject_id))
+        self.commit()
     
     def get_subjects(self):
-        cursor = self.conn.execute('SELECT id, name FROM subjects ORDER BY id')
+        cursor = self.conn.execute('SELECT id, name FROM subjects WHERE ready = 1 ORDER BY id')
         return cursor.fetchall()
     
     def get_subject_file(self, subject_id):
         cursor = self.conn.execute('SELECT name, file_path FROM subjects WHERE id = ?', (subject_id,))
         return cursor.fetchone()
     
-    def save_user_session(self, user_id, subject_id, questions, current_question, answers, score, total_questions):
-        questions_json = json.dumps(questions, ensure_ascii=False)
-        answers_json = json.dumps(answers, ensure_ascii=False)
+    def get_subject_id(self, name):
+        cursor = self.conn.execute('SELECT id FROM subjects WHERE name = ?', (name,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def migrate_user_sessions(self):
+        """Savollar matni saqlangan eski sessiyalar jadvalini user_sessions_legacy ga ko'chirish"""
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(user_sessions)')]
+        if 'questions' not in columns:
+            return
+        
+        legacy_exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_sessions_legacy'"
+        ).fetchone()
+        if legacy_exists:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO user_sessions_legacy
+                SELECT * FROM user_sessions
+            ''')
+            self.conn.execute('DROP TABLE user_sessions')
+        else:
+            self.conn.execute('ALTER TABLE user_sessions RENAME TO user_sessions_legacy')
+        self.commit()
+        logger.info("Eski formatdagi sessiyalar user_sessions_legacy jadvaliga ko'chirildi")
+    
+    def get_legacy_sessions(self):
+        """Hali ko'chirilmagan eski sessiyalar (jadval bo'lmasa None)"""
+        legacy_exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_sessions_legacy'"
+        ).fetchone()
+        if not legacy_exists:
+            return None
+        
+        cursor = self.conn.execute('''
+            SELECT user_id, subject_id, questions, current_question, answers, score, total_questions
+            FROM user_sessions_legacy
+        ''')
+        return cursor.fetchall()
+    
+    def drop_legacy_sessions(self):
+        self.conn.execute('DROP TABLE IF EXISTS user_sessions_legacy')
+        self.commit()
+    
+    def migrate_session_answers(self):
+        """answers JSON massivi bor sessiyalarni session_answers jurnaliga o'tkazish"""
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(user_sessions)')]
+        if 'answers' not in columns:
+            return
+        
+        rows = self.conn.execute('''
+            SELECT user_id, subject_id, question_ids, answers FROM user_sessions WHERE session_id IS NULL
+        ''').fetchall()
+        for user_id, subject_id, question_ids_json, answers_json in rows:
+            session_id = random.getrandbits(63)
+            question_ids = json.loads(question_ids_json)
+            answers = json.loads(answers_json or '[]')
+            # To'g'ri/noto'g'ri belgisi eski formatda saqlanmagan, ball esa score ustunida qoladi
+            self.conn.executemany('''
+                INSERT OR IGNORE INTO session_answers (session_id, question_index, question_id, selected, correct)
+                VALUES (?, ?, ?, ?, NULL)
+            ''', [(session_id, index, question_ids[index], selected)
+                  for index, selected in enumerate(answers) if selected != -1])
+            self.conn.execute(
+                'UPDATE user_sessions SET session_id = ? WHERE user_id = ? AND subject_id = ?',
+                (session_id, user_id, subject_id)
+            )
+        if rows:
+            logger.info(f"{len(rows)} ta sessiya javoblari session_answers jadvaliga ko'chirildi")
+    
+    def save_user_session(self, user_id, subject_id, session_id, bank_version, question_ids, seed,
+                          current_question, score, total_questions, permutations=None, mode='classic'):
+        # Faqat savol ID lari va seed saqlanadi - savol matni xotiradagi bankdan olinadi
+        question_ids_json = json.dumps(question_ids, separators=(',', ':'))
+        permutations_json = json.dumps(permutations, separators=(',', ':')) if permutations is not None else None
         
         self.conn.execute('''
             INSERT OR REPLACE INTO user_sessions 
-            (user_id, subject_id, questions, current_question, answers, score, total_questions)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, subject_id, questions_json, current_question, answers_json, score, total_questions))
-        self.conn.commit()
+            (user_id, subject_id, session_id, bank_version, question_ids, seed, permutations,
+             current_question, score, total_questions, mode)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, subject_id, session_id, bank_version, question_ids_json, seed, permutations_json,
+              current_question, score, total_questions, mode))
+        self.commit()
     
     def get_user_session(self, user_id, subject_id):
         cursor = self.conn.execute('''
-            SELECT questions, current_question, answers, score, total_questions 
+            SELECT session_id, bank_version, question_ids, permutations, current_question, score, total_questions,
+                   seed, mode
             FROM user_sessions WHERE user_id = ? AND subject_id = ?
         ''', (user_id, subject_id))
         row = cursor.fetchone()
         if row:
             return {
-                'questions': json.loads(row[0]),
-                'current_question': row[1],
-                'answers': json.loads(row[2]),
-                'score': row[3],
-                'total_questions': row[4]
+                'session_id': row[0],
+                'bank_version': row[1],
+                'question_ids': json.loads(row[2]),
+                'seed': row[7],
+                'permutations': json.loads(row[3]) if row[3] is not None else None,
+                'current_question': row[4],
+                'score': row[5],
+                'total_questions': row[6],
+                'mode': row[8] or 'classic'
             }
         return None
     
-    def delete_user_session(self, user_id, subject_id):
+    def get_user_poll_subjects(self, user_id):
+        """Foydalanuvchining tugallanmagan viktorina rejimidagi sessiyalari fanlari"""
+        cursor = self.conn.execute('''
+            SELECT subject_id FROM user_sessions
+            WHERE user_id = ? AND mode = 'poll' AND current_question < total_questions
+        ''', (user_id,))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def set_current_question(self, user_id, subject_id, current_question):
+        self.conn.execute(
+            'UPDATE user_sessions SET current_question = ? WHERE user_id = ? AND subject_id = ?',
+            (current_question, user_id, subject_id)
+        )
+        self.commit()
+    
+    def record_answer(self, session_id, user_id, subject_id, question_index, question_id, selected, correct):
+        """Javobni jurnalga yozish. Savolga avval javob berilgan bo'lsa False"""
+        cursor = self.conn.execute('''
+            INSERT OR IGNORE INTO session_answers (session_id, question_index, question_id, selected, correct)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (session_id, question_index, question_id, selected, int(correct)))
+        inserted = cursor.rowcount == 1
+        
+        # Ball jurnal bilan bir tranzaksiyada yangilanadi
+        if inserted and correct:
+            self.conn.execute(
+                'UPDATE user_sessions SET score = score + 1 WHERE user_id = ? AND subject_id = ? AND session_id = ?',
+                (user_id, subject_id, session_id)
+            )
+        self.commit()
+        return inserted
+    
+    def checkpoint_session(self, user_id, subject_id, session_id, current_question, score, answers):
+        """Keshdagi sessiya holatini (yangi javoblar, progress, ball) bitta tranzaksiyada yozish"""
+        self.conn.executemany('''
+            INSERT OR IGNORE INTO session_answers (session_id, question_index, question_id, selected, correct)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(session_id, question_index, question_id, selected, int(correct))
+              for question_index, question_id, selected, correct in answers])
+        self.conn.execute('''
+            UPDATE user_sessions SET current_question = ?, score = ?
+            WHERE user_id = ? AND subject_id = ? AND session_id = ?
+        ''', (current_question, score, user_id, subject_id, session_id))
+        self.commit()
+    
+    def get_session_answers(self, session_id):
+        cursor = self.conn.execute('''
+            SELECT question_index, question_id, selected, correct, answered_at
+            FROM session_answers WHERE session_id = ? ORDER BY question_index
+        ''', (session_id,))
+        return cursor.fetchall()
+    
+    def delete_user_session(self, user_id, subject_id, keep_answers=False):
+        if not keep_answers:
+            self.conn.execute('''
+                DELETE FROM session_answers WHERE session_id IN
+                (SELECT session_id FROM user_sessions WHERE user_id = ? AND subject_id = ?)
+            ''', (user_id, subject_id))
         self.conn.execute('DELETE FROM user_sessions WHERE user_id = ? AND subject_id = ?', (user_id, subject_id))
-        self.conn.commit()
+        self.commit()
     
-    def save_result(self, user_id, user_name, subject_id, score, total_questions, percentage):
+    def save_result(self, user_id, user_name, subject_id, score, total_questions, percentage, session_id=None):
         self.conn.execute('''
-            INSERT INTO results (user_id, user_name, subject_id, score, total_questions, percentage)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, user_name, subject_id, score, total_questions, percentage))
-        self.conn.commit()
\ No newline at end of file
+            INSERT INTO results (user_id, user_name, subject_id, score, total_questions, percentage, session_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, user_name, subject_id, score, total_questions, percentage, session_id))
+        self.commit()
+    
+    def save_results(self, rows):
+        """Bir nechta natijani bitta so'rov bilan yozish (guruh viktorinasi)"""
+        self.conn.executemany('''
+            INSERT INTO results (user_id, user_name, subject_id, score, total_questions, percentage, session_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        self.commit()
+
+
+
+class WriteBatcher:
+    """Yozuvlarni qisqa oynada yig'ib, bitta tranzaksiyada commit qiluvchi writer oqimi"""
+    
+    _STOP = object()
+    
+    def __init__(self, db: DatabaseManager, window: float = DB_BATCH_WINDOW, max_batch: int = DB_BATCH_MAX):
+        self.db = db
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+    
+    def submit(self, func, args, key=None, coalesce=False) -> Future:
+        """Yozuvni navbatga qo'yish. coalesce=True - kalit bo'yicha to'liq holat (oxirgisi yutadi)"""
+        if self._closed:
+            raise RuntimeError("WriteBatcher yopilgan")
+        future = Future()
+        self._queue.put((key, coalesce, func, args, future))
+        return future
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            
+            # Oyna tugaguncha yoki max_batch to'lguncha yig'ish
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            self._commit(batch)
+        self.db.close()
+    
+    def _commit(self, batch):
+        # Kalitdagi keyingi yozuv ham to'liq holat bo'lsa, oldingisi yozilmaydi.
+        # O'chirish, javoblar va natijalar kabi boshqa yozuvlar o'z tartibida qoladi
+        superseded = set()
+        last = {}
+        for index, (key, coalesce, func, args, future) in enumerate(batch):
+            if key is None:
+                continue
+            previous = last.get(key)
+            if coalesce and previous is not None and batch[previous][1]:
+                superseded.add(previous)
+            last[key] = index
+        
+        conn = self.db.conn
+        outcomes = []
+        self.db._local.in_batch = True
+        try:
+            if not conn.in_transaction:
+                conn.execute('BEGIN')
+            for index, (key, coalesce, func, args, future) in enumerate(batch):
+                if index in superseded:
+                    outcomes.append((future, None, None))
+                    continue
+                
+                # Har bir amal o'z savepoint'ida: xato faqat o'zini bekor qiladi
+                conn.execute('SAVEPOINT batch_op')
+                try:
+                    result = func(*args)
+                    conn.execute('RELEASE batch_op')
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO batch_op')
+                    conn.execute('RELEASE batch_op')
+                    outcomes.append((future, None, e))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Guruhli yozuvni commit qilishda xatolik: {e}")
+            conn.rollback()
+            outcomes = [(future, None, e) for key, coalesce, func, args, future in batch]
+        finally:
+            self.db._local.in_batch = False
+        
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+    
+    def close(self):
+        """Navbatdagi barcha yozuvlarni commit qilib, oqimni to'xtatish"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+
+class AsyncDatabaseManager:
+    """DatabaseManager uchun asinxron qobiq.
+    
+    Yozuvlar WriteBatcher orqali guruhlab commit qilinadi, o'qishlar kichik
+    oqimlar pulida bajariladi, shuning uchun sekin commit event loop'ni
+    to'xtatib qo'ymaydi. wait=False bo'lgan yozuvlar navbatga qo'yiladi
+    xolos; shu sessiyani o'qish navbatdagi yozuv tugashini kutadi.
+    """
+    
+    def __init__(self, db: DatabaseManager, readers: int = DB_READER_THREADS):
+        self.db = db
+        self._batcher = WriteBatcher(db)
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='db-reader')
+        self._pending = {}
+        atexit.register(self.close)
+    
+    async def _read(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, functools.partial(func, *args, **kwargs))
+    
+    async def _write(self, func, *args, key=None, coalesce=False, wait=True):
+        future = asyncio.wrap_future(self._batcher.submit(func, args, key, coalesce))
+        if key is not None:
+            self._pending[key] = future
+            future.add_done_callback(functools.partial(self._forget_pending, key))
+        if wait:
+            return await future
+        future.add_done_callback(self._log_failure)
+    
+    def _forget_pending(self, key, future):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+    
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Navbatdagi yozuvda xatolik: {future.exception()}")
+    
+    async def _wait_pending(self, key):
+        # Read-your-writes: shu kalit bo'yicha navbatdagi yozuv commit bo'lishini kutish
+        future = self._pending.get(key)
+        if future is not None:
+            await asyncio.wait([future])
+    
+    async def flush(self):
+        """Shu paytgacha navbatga qo'yilgan barcha yozuvlar commit bo'lishini kutish"""
+        await self._write(lambda: None)
+    
+    async def is_admin(self, user_id):
+        return await self._read(self.db.is_admin, user_id)
+    
+    async def add_admin(self, user_id, username):
+        return await self._write(self.db.add_admin, user_id, username)
+    
+    async def remove_admin(self, user_id):
+        return await self._write(self.db.remove_admin, user_id)
+    
+    async def get_admins(self):
+        return await self._read(self.db.get_admins)
+    
+    async def add_subject(self, name, file_path):
+        return await self._write(self.db.add_subject, name, file_path)
+    
+    async def mark_subject_ready(self, subject_id, question_count):
+        return await self._write(self.db.mark_subject_ready, subject_id, question_count)
+    
+    async def get_subject_questions(self, subject_id):
+        return await self._read(self.db.get_subject_questions, subject_id)
+    
+    async def save_subject_questions(self, subject_id, bank_version, questions):
+        return await self._write(self.db.save_subject_questions, subject_id, bank_version, questions)
+    
+    async def get_subjects(self):
+        return await self._read(self.db.get_subjects)
+    
+    async def get_subject_file(self, subject_id):
+        return await self._read(self.db.get_subject_file, subject_id)
+    
+    async def get_subject_id(self, name):
+        return await self._read(self.db.get_subject_id, name)
+    
+    async def get_legacy_sessions(self):
+        return await self._read(self.db.get_legacy_sessions)
+    
+    async def drop_legacy_sessions(self):
+        return await self._write(self.db.drop_legacy_sessions)
+    
+    async def save_user_session(self, user_id, subject_id, *args, wait=False):
+        # To'liq holat: bitta guruhda shu sessiyaning faqat oxirgi holati yoziladi
+        return await self._write(self.db.save_user_session, user_id, subject_id, *args,
+                                 key=('session', user_id, subject_id), coalesce=True, wait=wait)
+    
+    async def get_user_session(self, user_id, subject_id):
+        await self._wait_pending(('session', user_id, subject_id))
+        return await self._read(self.db.get_user_session, user_id, subject_id)
+    
+    async def get_user_poll_subjects(self, user_id):
+        return await self._read(self.db.get_user_poll_subjects, user_id)
+    
+    async def set_current_question(self, user_id, subject_id, current_question, wait=False):
+        return await self._write(self.db.set_current_question, user_id, subject_id, current_question,
+                                 key=('session', user_id, subject_id), wait=wait)
+    
+    async def record_answer(self, session_id, user_id, subject_id, *args):
+        # Natija (javob yangimi) kerak bo'lgani uchun commit kutiladi
+        return await self._write(self.db.record_answer, session_id, user_id, subject_id, *args,
+                                 key=('session', user_id, subject_id))
+    
+    async def checkpoint_session(self, user_id, subject_id, *args, wait=False):
+        return await self._write(self.db.checkpoint_session, user_id, subject_id, *args,
+                                 key=('session', user_id, subject_id), wait=wait)
+    
+    async def get_session_answers(self, session_id):
+        return await self._read(self.db.get_session_answers, session_id)
+    
+    async def delete_user_session(self, user_id, subject_id, keep_answers=False, wait=False):
+        return await self._write(self.db.delete_user_session, user_id, subject_id, keep_answers,
+                                 key=('session', user_id, subject_id), wait=wait)
+    
+    async def save_result(self, *args, wait=False):
+        return await self._write(self.db.save_result, *args, wait=wait)
+    
+    async def save_results(self, rows, wait=False):
+        return await self._write(self.db.save_results, rows, wait=wait)
+    
+    def close(self):
+        """Navbatdagi yozuvlarni commit qilib, oqimlarni to'xtatish"""
+        self._batcher.close()
+        self._readers.shutdown(wait=True)
@@ -1,82 +1,277 @@
 import os
 import re
+import csv
+import json
+import hashlib
 import logging
-from docx import Document
+import zipfile
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
 import PyPDF2
+from config import BANK_CACHE_FOLDER, PARSER_WORKERS, PDF_PAGES_PER_WORKER
+from question_bank import BANK_FORMAT, MappedQuestionBank, write_bank_file
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
 
 logger = logging.getLogger(__name__)
 
+# WordprocessingML teglari
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_BODY, W_P, W_TBL, W_SDT = _W + 'body', _W + 'p', _W + 'tbl', _W + 'sdt'
+W_R, W_HYPERLINK = _W + 'r', _W + 'hyperlink'
+W_T, W_TAB, W_PTAB, W_BR, W_CR, W_NO_BREAK_HYPHEN = (
+    _W + 't', _W + 'tab', _W + 'ptab', _W + 'br', _W + 'cr', _W + 'noBreakHyphen'
+)
+
+# Qator turlari (FileParser.classify_line)
+LINE_QUESTION, LINE_OPTION, LINE_TEXT = range(3)
+
+# Savol: "1." "1)" "1 ." yoki "«"; variant: "A)" "b." "C " - bitta regex bilan
+_QUESTION_RE = re.compile(r'\d+(?:\)|\s*\.)|«')
+_OPTION_RE = re.compile(r'[A-Da-d][.)\s]')
+_LINE_RE = re.compile(r'(?P<question>\d+(?:\)|\s*\.)|«)|(?P<option>[A-Da-d][.)\s])')
+_OPTION_MARKER_RE = re.compile(r'^[A-Da-d][.)]\s*')
+_OPTION_LETTER_RE = re.compile(r'^[A-Da-d]\s+')
+_OPTION_PREFIX_RE = re.compile(r'(?:[A-Da-d][.)]\s*)?(?:[A-Da-d]\s+)?')
+
+# Jadval (CSV/TSV) va JSON-lines importi: ustun nomlari
+SUPPORTED_EXTENSIONS = ('.docx', '.pdf', '.csv', '.tsv', '.jsonl')
+_QUESTION_COLUMNS = {'question', 'savol', 'text', 'вопрос', 'савол'}
+_CORRECT_COLUMNS = {'correct', 'correct_answer', 'answer', 'javob', "to'g'ri", 'togri', 'ответ', 'жавоб'}
+_OPTION_COLUMN_RE = re.compile(r'(?:option|variant|вариант)?[\s_]*(?:[a-h]|\d{1,2})')
+
+# Parser mantig'i o'zgarsa (shu fayl tahrirlansa) kesh avtomatik eskiradi
+with open(__file__, 'rb') as _source:
+    PARSER_VERSION = hashlib.sha256(_source.read()).hexdigest()[:12]
+
 class FileParser:
     @staticmethod
-    def parse_file(file_path: str):
-        """Fayldan savollarni o'qish - asosiy metod"""
+    def parse_file(file_path: str, strict: bool = False):
+        """Fayldan savollarni o'qish - asosiy metod (strict=True: xatolik yutilmaydi)"""
         if not os.path.exists(file_path):
             logger.error(f"Fayl topilmadi: {file_path}")
             return []
         
         try:
             if file_path.endswith('.docx'):
-                questions = FileParser.parse_docx(file_path)
+                # Ikkala usul bitta paragraflar oqimida parallel ishlaydi
+                docx_builder = _QuestionBuilder(join_option_lines=False)
+                text_builder = _QuestionBuilder(join_option_lines=True)
+                for text in FileParser.iter_docx_paragraphs(file_path):
+                    docx_builder.feed(text.strip())
+                    for line in text.split('\n'):
+                        text_builder.feed(line.strip())
+                
+                questions = docx_builder.finish()
+                logger.info(f"Word fayldan {len(questions)} ta savol topildi")
                 if not questions:
-                    questions = FileParser.parse_docx_advanced(file_path)
+                    logger.warning(f"Faylda savol topilmadi. Kengaytirilgan usul: {file_path}")
+                    questions = text_builder.finish()
+                    logger.info(f"Matndan {len(questions)} ta savol topildi")
                 return questions
             elif file_path.endswith('.pdf'):
-                questions = FileParser.parse_pdf(file_path)
+                questions = FileParser.parse_pdf(file_path, strict)
+                return questions
+            elif file_path.endswith('.csv') or file_path.endswith('.tsv'):
+                questions = FileParser.parse_table(file_path, '\t' if file_path.endswith('.tsv') else ',')
+                logger.info(f"Jadvaldan {len(questions)} ta savol o'qildi")
+                return questions
+            elif file_path.endswith('.jsonl'):
+                questions = FileParser.parse_jsonl(file_path)
+                logger.info(f"JSON-lines fayldan {len(questions)} ta savol o'qildi")
                 return questions
             else:
                 logger.error(f"Noto'g'ri fayl formati: {file_path}")
                 return []
         except Exception as e:
+            if strict:
+                raise
             logger.error(f"Faylni o'qishda xatolik: {e}")
             return []
     
     @staticmethod
-    def parse_docx(file_path: str):
-        """Word faylidan savollarni o'qish - asosiy metod"""
+    def load_questions(file_path: str, strict: bool = False):
+        """Tekshirilgan savollarni keshdan yoki fayldan olish (to'liq jarayon)"""
+        if not os.path.exists(file_path):
+            logger.error(f"Fayl topilmadi: {file_path}")
+            return []
+        
+        cache_path = FileParser.cache_path(file_path)
+        cached = FileParser.read_cache(cache_path)
+        if cached is not None:
+            logger.info(f"Savollar keshdan olindi: {file_path} ({len(cached)} ta)")
+            return cached
+        
+        # Word uchun oddiy va kengaytirilgan usullar parse_file ichida
+        try:
+            questions = FileParser.parse_file(file_path, strict=True)
+        except Exception as e:
+            # Muvaffaqiyatsiz tahlil (masalan, xotira chegarasi) keshga yozilmaydi
+            if strict:
+                raise
+            logger.error(f"Faylni o'qishda xatolik: {e}")
+            return []
+        
+        # Savollarni tekshirish
+        questions = FileParser.validate_questions(questions)
+        FileParser.write_cache(cache_path, questions)
+        return questions
+    
+    @staticmethod
+    def compile_bank_file(file_path: str, strict: bool = False):
+        """Fayl uchun .qbank bankini tayyorlash: (bank yo'li, None) yoki kesh yozilmasa (None, savollar)"""
+        if not os.path.exists(file_path):
+            return None, []
+        
+        cache_path = FileParser.cache_path(file_path)
+        if os.path.exists(cache_path):
+            return cache_path, None
+        
+        # Fayl bir marta tahlil qilinadi; keshga yozib bo'lmasa natija o'zi qaytariladi
+        questions = FileParser.load_questions(file_path, strict)
+        if os.path.exists(cache_path):
+            return cache_path, None
+        return None, questions
+    
+    @staticmethod
+    def file_sha256(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def cache_path(file_path: str) -> str:
+        """Kesh fayli nomi: manba fayl SHA-256 xeshi va parser versiyasi"""
+        return os.path.join(BANK_CACHE_FOLDER, f"{FileParser.file_sha256(file_path)}-{PARSER_VERSION}-{BANK_FORMAT}.qbank")
+    
+    @staticmethod
+    def read_cache(cache_path: str):
+        try:
+            bank = MappedQuestionBank(cache_path)
+            try:
+                return bank.to_dicts()
+            finally:
+                bank.close()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Kesh faylini o'qib bo'lmadi ({cache_path}): {e}")
+            return None
+    
+    @staticmethod
+    def write_cache(cache_path: str, questions: list):
         try:
-            doc = Document(file_path)
-            questions = []
-            current_question = None
-            current_options = []
-            question_number = 0
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # Yarim yozilgan fayl o'qilmasligi uchun avval vaqtinchalik faylga
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            write_bank_file(tmp_path, questions, FileParser.bank_version(questions))
+            os.replace(tmp_path, cache_path)
             
-            for paragraph in doc.paragraphs:
-                text = paragraph.text.strip()
-                if not text:
-                    continue
-                
-                # Savolni aniqlash (raqam bilan boshlanadigan)
-                if FileParser.is_question_start(text):
-                    # Oldingi savolni saqlash
-                    if current_question and len(current_options) >= 2:
-                        current_question['options'] = current_options
-                        questions.append(current_question)
-                        question_number += 1
+            # Shu faylning eski parser versiyasidagi keshlarini o'chirish
+            file_hash = os.path.basename(cache_path).split('-')[0]
+            for name in os.listdir(os.path.dirname(cache_path)):
+                if name.startswith(file_hash + '-') and name != os.path.basename(cache_path):
+                    try:
+                        os.remove(os.path.join(os.path.dirname(cache_path), name))
+                    except OSError as e:
+                        # Windows'da boshqa jarayon xaritalagan fayl o'chmaydi
+                        logger.warning(f"Eski keshni o'chirib bo'lmadi ({name}): {e}")
+        except Exception as e:
+            logger.warning(f"Kesh faylini yozib bo'lmadi ({cache_path}): {e}")
+    
+    @staticmethod
+    def remove_cache(file_hash: str):
+        """Manba xeshiga tegishli barcha keshlarni (.qbank va sahifalar) o'chirish"""
+        try:
+            names = os.listdir(BANK_CACHE_FOLDER)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.startswith(file_hash + '-') or name == f"{file_hash}.pages.json":
+                try:
+                    os.remove(os.path.join(BANK_CACHE_FOLDER, name))
+                except OSError as e:
+                    logger.warning(f"Eski keshni o'chirib bo'lmadi ({name}): {e}")
+    
+    @staticmethod
+    def check_archive_size(file_path: str, max_bytes: int):
+        """.docx (zip) arxiv ochilgandagi jami hajmini tekshirish (zip bomb'dan himoya)"""
+        if not file_path.endswith('.docx'):
+            return
+        with zipfile.ZipFile(file_path) as archive:
+            total = sum(info.file_size for info in archive.infolist())
+        if total > max_bytes:
+            raise ValueError(
+                f"arxiv ochilganda {total // (1024 * 1024)} MB bo'ladi, "
+                f"ruxsat etilgani {max_bytes // (1024 * 1024)} MB"
+            )
+    
+    @staticmethod
+    def iter_docx_paragraphs(file_path: str):
+        """word/document.xml ni lxml iterparse bilan oqim sifatida o'qish.
+        
+        Hujjat tanasidagi har bir paragraf matnini (python-docx dagi
+        paragraph.text kabi) qaytaradi, o'qilgan elementlar darhol tozalanadi.
+        """
+        with zipfile.ZipFile(file_path) as archive:
+            with archive.open('word/document.xml') as xml:
+                events = etree.iterparse(xml, events=('end',), tag=(W_P, W_TBL, W_SDT),
+                                         resolve_entities=False, huge_tree=True)
+                for _, element in events:
+                    parent = element.getparent()
+                    if parent is None or parent.tag != W_BODY:
+                        # Jadval ichidagi paragraflar jadval bilan birga tozalanadi
+                        continue
                     
-                    # Yangi savolni boshlash
-                    current_question = {
-                        'question': text,
-                        'options': [],
-                        'correct_answer': 0  # Birinchi variant to'g'ri javob
-                    }
-                    current_options = []
-                
-                # Variantlarni aniqlash
-                elif FileParser.is_option(text):
-                    if current_question:
-                        clean_option = FileParser.clean_option_text(text)
-                        if clean_option:
-                            current_options.append(clean_option)
-                
-                # Agar matn uzun bo'lsa va variant bo'lmasa, savol qismiga qo'shish
-                elif current_question and len(current_options) == 0 and len(text) > 5:
-                    current_question['question'] += " " + text
+                    if element.tag == W_P:
+                        yield FileParser._paragraph_text(element)
+                    
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del parent[0]
+    
+    @staticmethod
+    def _paragraph_text(paragraph) -> str:
+        parts = []
+        for child in paragraph:
+            if child.tag == W_R:
+                runs = (child,)
+            elif child.tag == W_HYPERLINK:
+                runs = child.iterchildren(W_R)
+            else:
+                continue
             
-            # Oxirgi savolni qo'shish
-            if current_question and len(current_options) >= 2:
-                current_question['options'] = current_options
-                questions.append(current_question)
+            for run in runs:
+                for item in run:
+                    tag = item.tag
+                    if tag == W_T:
+                        parts.append(item.text or '')
+                    elif tag == W_TAB or tag == W_PTAB:
+                        parts.append('\t')
+                    elif tag == W_BR:
+                        if item.get(_W + 'type', 'textWrapping') == 'textWrapping':
+                            parts.append('\n')
+                    elif tag == W_CR:
+                        parts.append('\n')
+                    elif tag == W_NO_BREAK_HYPHEN:
+                        parts.append('-')
+        return ''.join(parts)
+    
+    @staticmethod
+    def parse_docx(file_path: str):
+        """Word faylidan savollarni o'qish - asosiy metod"""
+        try:
+            builder = _QuestionBuilder(join_option_lines=False)
+            for text in FileParser.iter_docx_paragraphs(file_path):
+                builder.feed(text.strip())
             
+            questions = builder.finish()
             logger.info(f"Word fayldan {len(questions)} ta savol topildi")
             return questions
         
@@ -88,125 +283,260 @@ class FileParser:
     def parse_docx_advanced(file_path: str):
         """Kengaytirilgan Word faylini o'qish - muqobil metod"""
         try:
-            doc = Document(file_path)
-            full_text = ""
+            builder = _QuestionBuilder(join_option_lines=True)
+            for text in FileParser.iter_docx_paragraphs(file_path):
+                for line in text.split('\n'):
+                    builder.feed(line.strip())
             
-            # Barcha paragraflarni bitta matnga birlashtirish
-            for paragraph in doc.paragraphs:
-                text = paragraph.text.strip()
-                if text:
-                    full_text += text + "\n"
-            
-            return FileParser.parse_text(full_text)
+            questions = builder.finish()
+            logger.info(f"Matndan {len(questions)} ta savol topildi")
+            return questions
         
         except Exception as e:
             logger.error(f"Kengaytirilgan Word o'qishda xatolik: {e}")
             return []
     
     @staticmethod
-    def parse_pdf(file_path: str):
+    def parse_pdf(file_path: str, strict: bool = False):
         """PDF faylidan savollarni o'qish"""
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                full_text = ""
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    text = page.extract_text()
-                    if text:
-                        full_text += f"--- Page {page_num + 1} ---\n{text}\n"
-                
-                logger.info(f"PDF dan {len(full_text)} belgi o'qildi")
-                return FileParser.parse_text(full_text)
+            pages = FileParser.extract_pdf_pages(file_path)
+            
+            # Matn bir marta birlashtiriladi
+            full_text = "".join(
+                f"--- Page {page_num + 1} ---\n{text}\n"
+                for page_num, text in enumerate(pages) if text
+            )
+            
+            logger.info(f"PDF dan {len(full_text)} belgi o'qildi")
+            return FileParser.parse_text(full_text)
         
         except Exception as e:
+            if strict:
+                raise
             logger.error(f"PDF o'qishda xatolik: {e}")
             return []
     
     @staticmethod
-    def parse_text(text: str):
-        """Matndan savollarni ajratib olish"""
+    def extract_pdf_pages(file_path: str) -> list:
+        """PDF sahifalari matnini olish (sahifalar keshi va jarayonlar puli bilan)"""
+        cache_path = os.path.join(BANK_CACHE_FOLDER, f"{FileParser.file_sha256(file_path)}.pages.json")
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            logger.info(f"PDF sahifalari keshdan olindi ({cached['backend']}): {file_path}")
+            return cached['pages']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Sahifalar keshini o'qib bo'lmadi ({cache_path}): {e}")
+        
+        backend, page_count = FileParser.choose_pdf_backend(file_path)
+        ranges = [
+            (start, min(start + PDF_PAGES_PER_WORKER, page_count))
+            for start in range(0, page_count, PDF_PAGES_PER_WORKER)
+        ]
+        
+        workers = min(PARSER_WORKERS, len(ranges), os.cpu_count() or 1)
+        if workers > 1:
+            # Sahifa oraliqlari parallel jarayonlarda o'qiladi
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = list(pool.map(extract_pdf_page_range, *zip(*[
+                    (file_path, backend, start, stop) for start, stop in ranges
+                ])))
+        else:
+            # Bitta jarayonda faylni qayta-qayta ochmaslik uchun bir o'qishda
+            chunks = [extract_pdf_page_range(file_path, backend, 0, page_count)]
+        pages = [text for chunk in chunks for text in chunk]
+        logger.info(f"PDF dan {len(pages)} sahifa o'qildi ({backend})")
+        
+        try:
+            os.makedirs(BANK_CACHE_FOLDER, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'backend': backend, 'pages': pages}, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning(f"Sahifalar keshini yozib bo'lmadi ({cache_path}): {e}")
+        return pages
+    
+    @staticmethod
+    def choose_pdf_backend(file_path: str):
+        """Fayl uchun matn ajratish kutubxonasini tanlash: (backend, sahifalar soni).
+        
+        PyPDF2 tez, lekin ba'zi fayllarda (masalan, murakkab shriftlar) matn
+        bermaydi - bunday hollarda pdfplumber ishlatiladi.
+        """
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            page_count = len(pdf_reader.pages)
+            probe = [pdf_reader.pages[i].extract_text() or "" for i in range(min(3, page_count))]
+        
+        if pdfplumber is not None and probe and sum(len(text.strip()) for text in probe) < 20 * len(probe):
+            return 'pdfplumber', page_count
+        return 'pypdf2', page_count
+    
+    @staticmethod
+    def parse_table(file_path: str, delimiter: str = ','):
+        """CSV/TSV fayldan savollarni qatorma-qator o'qish.
+        
+        Birinchi qator - sarlavha: savol ustuni (question/savol), variantlar
+        (A, B, ... yoki option_1, variant_2, ...) va to'g'ri javob ustuni
+        (correct/javob: variant matni, harf yoki 1 dan boshlanuvchi raqam).
+        Sarlavha tanilmasa, ustunlar "savol, variantlar..." deb olinadi va
+        Word fayllardagidek birinchi variant to'g'ri hisoblanadi.
+        """
         questions = []
-        lines = text.split('\n')
-        current_question = None
-        current_options = []
-        question_number = 0
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            if not line:
-                i += 1
-                continue
-            
-            # Savolni aniqlash
-            if FileParser.is_question_start(line):
-                # Oldingi savolni saqlash
-                if current_question and len(current_options) >= 2:
-                    current_question['options'] = current_options
-                    questions.append(current_question)
-                    question_number += 1
-                
-                # Yangi savolni boshlash
-                current_question = {
-                    'question': line,
-                    'options': [],
-                    'correct_answer': 0
-                }
-                current_options = []
-            
-            # Variantlarni aniqlash
-            elif FileParser.is_option(line):
-                if current_question:
-                    clean_option = FileParser.clean_option_text(line)
-                    if clean_option:
-                        current_options.append(clean_option)
-            
-            # Keyingi qator savolning davomi bo'lishi mumkin
-            elif current_question and not current_options and len(line) > 5:
-                # Yangi qator bo'sh joy bilan qo'shiladi
-                current_question['question'] += " " + line
+        # Excel saqlagan fayllar BOM bilan boshlanadi
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            header = next(reader, None)
+            if header is None:
+                return []
             
-            # Variantlarning davomi (ko'p qatorli variantlar)
-            elif current_question and current_options and len(line) > 3 and not FileParser.is_option(line):
-                # Oxirgi variantga qo'shish
-                if current_options:
-                    current_options[-1] += " " + line
+            columns = [column.strip().lower() for column in header]
+            question_column = next((i for i, c in enumerate(columns) if c in _QUESTION_COLUMNS), None)
+            if question_column is None:
+                # Sarlavhasiz jadval: birinchi qator ham savol
+                question_column, option_columns, correct_column = 0, None, None
+                rows = itertools.chain([header], reader)
+            else:
+                correct_column = next((i for i, c in enumerate(columns) if c in _CORRECT_COLUMNS), None)
+                option_columns = [
+                    i for i, c in enumerate(columns)
+                    if i not in (question_column, correct_column) and _OPTION_COLUMN_RE.fullmatch(c)
+                ]
+                if not option_columns:
+                    # Har qatorni alohida rad etish o'rniga bitta tushunarli xatolik
+                    raise ValueError("sarlavhada variant ustunlari topilmadi "
+                                     "(A, B, ... yoki option_1, variant_2, ... bo'lishi kerak)")
+                rows = reader
             
-            i += 1
+            for row_number, row in enumerate(rows, start=1):
+                if question_column >= len(row):
+                    continue
+                if option_columns is None:
+                    options = row[question_column + 1:]
+                    correct = None
+                else:
+                    options = [row[i] if i < len(row) else '' for i in option_columns]
+                    correct = row[correct_column] if correct_column is not None and correct_column < len(row) else None
+                record = FileParser._table_record(row[question_column], options, correct)
+                if record is None:
+                    logger.warning(f"{row_number}-qatorda to'g'ri javob aniqlanmadi: {file_path}")
+                    continue
+                questions.append(record)
+        return questions
+    
+    @staticmethod
+    def parse_jsonl(file_path: str):
+        """JSON-lines fayldan savollarni o'qish.
         
-        # Oxirgi savolni qo'shish
-        if current_question and len(current_options) >= 2:
-            current_question['options'] = current_options
-            questions.append(current_question)
+        Har qator: {"question": ..., "options": [...], "correct_answer": 0 dan
+        boshlanuvchi indeks} yoki "correct_answer" o'rniga "correct" (variant
+        matni, harf yoki 1 dan boshlanuvchi raqam).
+        """
+        questions = []
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                    question = next(item[key] for key in ('question', 'savol') if key in item)
+                    options = [str(option) for option in item.get('options', [])]
+                    if isinstance(item.get('correct_answer'), int):
+                        correct = item['correct_answer']
+                    else:
+                        correct = item.get('correct', item.get('answer'))
+                        correct = None if correct is None else str(correct)
+                    record = FileParser._table_record(str(question), options, correct)
+                except Exception as e:
+                    logger.warning(f"{line_number}-qatorni o'qib bo'lmadi ({file_path}): {e}")
+                    continue
+                if record is None:
+                    logger.warning(f"{line_number}-qatorda to'g'ri javob aniqlanmadi: {file_path}")
+                    continue
+                questions.append(record)
+        return questions
+    
+    @staticmethod
+    def _table_record(question: str, options: list, correct):
+        """Jadval qatoridan savol lug'ati; to'g'ri javob aniqlanmasa None"""
+        options = [option.strip() for option in options]
+        
+        if isinstance(correct, int):
+            # JSON dagi 0 dan boshlanuvchi indeks
+            index = correct
+        else:
+            correct = (correct or '').strip()
+            # Variant matni bilan aniq moslik birinchi: variantlar "10", "20" kabi sonlar bo'lishi mumkin
+            if not correct:
+                index = 0
+            elif correct in options:
+                index = options.index(correct)
+            elif len(correct) == 1 and correct.upper() in 'ABCDEFGH':
+                index = ord(correct.upper()) - ord('A')
+            elif correct.isdigit():
+                index = int(correct) - 1
+            else:
+                return None
+        
+        if not 0 <= index < len(options) or not options[index]:
+            return None
         
+        # Bo'sh katakchalar tashlanadi, to'g'ri javob indeksi shunga moslanadi
+        return {
+            'question': question.strip(),
+            'options': [option for option in options if option],
+            'correct_answer': sum(1 for option in options[:index] if option)
+        }
+    
+    @staticmethod
+    def parse_text(text: str):
+        """Matndan savollarni ajratib olish"""
+        builder = _QuestionBuilder(join_option_lines=True)
+        for line in text.split('\n'):
+            builder.feed(line.strip())
+        
+        questions = builder.finish()
         logger.info(f"Matndan {len(questions)} ta savol topildi")
         return questions
     
+    @staticmethod
+    def classify_line(line: str):
+        """Tozalangan qatorni bir marta tasniflash: (tur, matn).
+        
+        Variant uchun matn prefiksi olib tashlangan holda qaytadi
+        (juda qisqa bo'lsa bo'sh satr).
+        """
+        match = _LINE_RE.match(line)
+        if match is not None:
+            if match.lastgroup == 'option':
+                option = line[_OPTION_PREFIX_RE.match(line).end():].strip()
+                return LINE_OPTION, option if len(option) >= 2 else ""
+            if len(line) >= 3:
+                return LINE_QUESTION, line
+            return LINE_TEXT, line
+        
+        # Agar raqam bilan boshlansa va uzunligi 100 dan kichik bo'lsa
+        if 3 <= len(line) < 100 and line[0].isdigit():
+            return LINE_QUESTION, line
+        return LINE_TEXT, line
+    
     @staticmethod
     def is_question_start(text: str) -> bool:
         """Matn savol boshlanishi ekanligini tekshirish"""
         if not text or len(text) < 3:
             return False
         
-        # Raqam bilan boshlanadigan va nuqta/qavs borligini tekshirish
-        patterns = [
-            r'^\d+[\.\)]',          # 1. yoki 1)
-            r'^\d+\.\s',            # 1. (bo'sh joy bilan)
-            r'^\d+\)\s',            # 1) (bo'sh joy bilan)
-            r'^«',                  # « bilan boshlanadigan
-            r'^\d+\s*\.',           # 1 . (ortiqcha bo'sh joy bilan)
-        ]
-        
-        for pattern in patterns:
-            if re.match(pattern, text):
-                return True
-        
-        # Agar raqam bilan boshlansa va uzunligi 5 dan kichik bo'lsa
-        if text[0].isdigit() and len(text) < 100:
+        # 1. / 1) / 1 . yoki « bilan boshlanadigan
+        if _QUESTION_RE.match(text):
             return True
         
-        return False
+        # Agar raqam bilan boshlansa va uzunligi 100 dan kichik bo'lsa
+        return text[0].isdigit() and len(text) < 100
     
     @staticmethod
     def is_option(text: str) -> bool:
@@ -214,18 +544,8 @@ class FileParser:
         if not text or len(text) < 2:
             return False
         
-        # Variant formatlarini tekshirish
-        option_patterns = [
-            r'^[A-Da-d][\.\)]',     # A), B), C), D) yoki a), b), c), d)
-            r'^[A-Da-d]\.',         # A., B., C., D. yoki a., b., c., d.
-            r'^[A-Da-d]\s',         # A , B , C , D  (bo'sh joy bilan)
-        ]
-        
-        for pattern in option_patterns:
-            if re.match(pattern, text):
-                return True
-        
-        return False
+        # A) / b. / C  (bo'sh joy bilan)
+        return _OPTION_RE.match(text) is not None
     
     @staticmethod
     def clean_option_text(text: str) -> str:
@@ -233,17 +553,9 @@ class FileParser:
         if not text:
             return ""
         
-        # Variant prefiksini olib tashlash
-        patterns_to_remove = [
-            r'^[A-Da-d][\.\)]\s*',  # A) , B. , c) , d.
-            r'^[A-Da-d]\s+',        # A , B , C , D
-        ]
-        
-        for pattern in patterns_to_remove:
-            text = re.sub(pattern, '', text).strip()
-        
-        # Qo'shimcha tozalash
-        text = text.strip()
+        # Variant prefiksini olib tashlash: "A) ", "b. " va keyin "A "
+        text = _OPTION_MARKER_RE.sub('', text, count=1).strip()
+        text = _OPTION_LETTER_RE.sub('', text, count=1).strip()
         
         # Agar matn juda qisqa bo'lsa, e'tiborga olmaslik
         if len(text) < 2:
@@ -297,18 +609,28 @@ class FileParser:
         logger.info(f"Tekshiruvdan {len(validated)}/{len(questions)} ta savol o'tdi")
         return validated
     
+    @staticmethod
+    def bank_version(questions: list) -> str:
+        """Savollar bankining qisqa versiya xeshi (sessiyalar shu versiyaga bog'lanadi)"""
+        digest = hashlib.sha256()
+        for q in questions:
+            record = [q['question'], q['options'], q.get('correct_answer', 0)]
+            digest.update(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()[:16]
+    
     @staticmethod
     def debug_file_content(file_path: str):
         """Fayl tarkibini debug qilish"""
         try:
             if file_path.endswith('.docx'):
-                doc = Document(file_path)
                 content = []
-                for i, paragraph in enumerate(doc.paragraphs):
-                    text = paragraph.text.strip()
+                for i, text in enumerate(FileParser.iter_docx_paragraphs(file_path)):
+                    text = text.strip()
                     if text:
                         content.append(f"{i}: {text}")
-                return "\n".join(content[:50])  # Faqat birinchi 50 qator
+                        if len(content) == 50:  # Faqat birinchi 50 qator
+                            break
+                return "\n".join(content)
             else:
                 with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                     return f.read(2000)  # Faqat birinchi 2000 belgi
@@ -320,7 +642,6 @@ class FileParser:
         """Fayl strukturasi tahlili"""
         try:
             if file_path.endswith('.docx'):
-                doc = Document(file_path)
                 stats = {
                     'total_paragraphs': 0,
                     'non_empty_paragraphs': 0,
@@ -329,8 +650,9 @@ class FileParser:
                     'sample_lines': []
                 }
                 
-                for i, paragraph in enumerate(doc.paragraphs[:100]):  # Birinchi 100 paragraf
-                    text = paragraph.text.strip()
+                paragraphs = itertools.islice(FileParser.iter_docx_paragraphs(file_path), 100)  # Birinchi 100 paragraf
+                for i, text in enumerate(paragraphs):
+                    text = text.strip()
                     stats['total_paragraphs'] += 1
                     
                     if text:
@@ -388,4 +710,79 @@ class FileParser:
                 logger.warning(f"Regex bilan savol ajratishda xatolik: {e}")
                 continue
         
-        return questions
\ No newline at end of file
+        return questions
+
+
+class _QuestionBuilder:
+    """Qatorlar oqimidan savollarni yig'uvchi holat mashinasi.
+    
+    join_option_lines=True bo'lsa variantning keyingi qatorlari unga qo'shiladi
+    (matn/PDF usuli), aks holda e'tiborsiz qoldiriladi (Word usuli).
+    """
+    
+    def __init__(self, join_option_lines: bool):
+        self.join_option_lines = join_option_lines
+        self.questions = []
+        self.current_question = None
+        self.current_options = []
+    
+    def feed(self, line: str):
+        if not line:
+            return
+        
+        kind, text = FileParser.classify_line(line)
+        
+        # Savolni aniqlash (raqam bilan boshlanadigan)
+        if kind == LINE_QUESTION:
+            # Oldingi savolni saqlash
+            self._flush()
+            
+            # Yangi savolni boshlash
+            self.current_question = {
+                'question': text,
+                'options': [],
+                'correct_answer': 0  # Birinchi variant to'g'ri javob
+            }
+            self.current_options = []
+        
+        # Variantlarni aniqlash
+        elif kind == LINE_OPTION:
+            if self.current_question and text:
+                self.current_options.append(text)
+        
+        # Agar matn uzun bo'lsa va variant bo'lmasa, savol qismiga qo'shish
+        elif self.current_question and not self.current_options and len(line) > 5:
+            self.current_question['question'] += " " + line
+        
+        # Variantlarning davomi (ko'p qatorli variantlar)
+        elif self.join_option_lines and self.current_question and self.current_options and len(line) > 3:
+            self.current_options[-1] += " " + line
+    
+    def _flush(self):
+        if self.current_question and len(self.current_options) >= 2:
+            self.current_question['options'] = self.current_options
+            self.questions.append(self.current_question)
+    
+    def finish(self) -> list:
+        # Oxirgi savolni qo'shish
+        self._flush()
+        self.current_question = None
+        self.current_options = []
+        return self.questions
+
+
+def extract_pdf_page_range(file_path: str, backend: str, start: int, stop: int) -> list:
+    """[start, stop) oraliqdagi sahifalar matni (jarayonlar pulida ham ishlaydi)"""
+    pages = []
+    if backend == 'pdfplumber':
+        with pdfplumber.open(file_path) as pdf:
+            for page in pdf.pages[start:stop]:
+                pages.append(page.extract_text() or "")
+                # pdfplumber sahifa obyektlarini keshlab qo'yadi
+                page.close()
+    else:
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for page_num in range(start, stop):
+                pages.append(pdf_reader.pages[page_num].extract_text() or "")
+    return pages
@@ -0,0 +1,369 @@
+import time
+import random
+import asyncio
+import logging
+from array import array
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, CommandHandler
+from config import GROUP_LEADERBOARD_INTERVAL, GROUP_LEADERBOARD_TOP
+from database import AsyncDatabaseManager
+from bank_cache import BankCache
+from session_cache import option_permutation
+
+logger = logging.getLogger(__name__)
+
+# Telegram xabar chegarasi 4096 belgi; emoji UTF-16 da ikki birlik bo'lgani uchun zaxira bilan
+MESSAGE_LIMIT = 4000
+
+def fit_message(title: str, question_text: str, tail: str) -> str:
+    """Xabarni chegaraga sig'dirish: kerak bo'lsa savol matni qisqartiriladi"""
+    room = MESSAGE_LIMIT - len(title) - len(tail)
+    if len(question_text) > room:
+        question_text = question_text[:max(0, room - 3)] + "..."
+    return f"{title}{question_text}{tail}"[:MESSAGE_LIMIT]
+
+class GroupGame:
+    """Guruhdagi bitta viktorina holati (faqat xotirada).
+
+    Har bir ishtirokchi slot raqami oladi: ball va oxirgi javob bergan savoli
+    slot bo'yicha massivlarda saqlanadi. Joriy savol variantlari bo'yicha
+    hisoblagichlar har savolda yangilanadi. Bazaga faqat o'yin oxirida
+    barcha natijalar bitta so'rov bilan yoziladi.
+    """
+    
+    def __init__(self, chat_id: int, host_id: int, subject_id: int, subject_name: str, questions, question_ids: list):
+        self.chat_id = chat_id
+        self.host_id = host_id
+        self.subject_id = subject_id
+        self.subject_name = subject_name
+        self.questions = questions
+        self.question_ids = question_ids
+        self.game_id = random.getrandbits(63)
+        self.nonce = self.game_id & 0xFFFF
+        self.seed = random.getrandbits(63)
+        self.current = 0
+        
+        # Joriy savol xabari
+        self.message_id = None
+        self.options_text = ""
+        self.reply_markup = None
+        self.counts = array('I', [0]) * len(self.question()[0].options)
+        self.answer_count = 0
+        
+        # Ishtirokchilar (slot bo'yicha)
+        self.slots = {}
+        self.user_ids = array('q')
+        self.names = []
+        self.scores = array('H')
+        self.last_answered = array('i')
+        
+        # Reyting tahriri
+        self.edit_task = None
+        self.last_edit = 0.0
+    
+    def question(self):
+        """(savol, variantlar tartibi) joriy savol uchun"""
+        question = self.questions[self.question_ids[self.current]]
+        return question, option_permutation({'seed': self.seed}, self.current, len(question.options))
+    
+    def next_question(self):
+        self.current += 1
+        self.message_id = None
+        self.answer_count = 0
+        if self.current < len(self.question_ids):
+            self.counts = array('I', [0]) * len(self.question()[0].options)
+    
+    def answer(self, user_id: int, name: str, choice: int, correct: bool) -> bool:
+        """Javobni hisoblash. Shu savolga avval javob bergan bo'lsa False"""
+        slot = self.slots.get(user_id)
+        if slot is None:
+            slot = len(self.names)
+            self.slots[user_id] = slot
+            self.user_ids.append(user_id)
+            self.names.append(name)
+            self.scores.append(0)
+            self.last_answered.append(-1)
+        if self.last_answered[slot] == self.current:
+            return False
+        
+        self.last_answered[slot] = self.current
+        self.counts[choice] += 1
+        self.answer_count += 1
+        if correct:
+            self.scores[slot] += 1
+        return True
+    
+    def leaderboard(self, top: int = GROUP_LEADERBOARD_TOP) -> list:
+        """[(ism, ball)] ball bo'yicha kamayish tartibida"""
+        order = sorted(range(len(self.names)), key=lambda slot: -self.scores[slot])[:top]
+        return [(self.names[slot], self.scores[slot]) for slot in order]
+    
+    def leaderboard_text(self, top: int = GROUP_LEADERBOARD_TOP) -> str:
+        lines = [f"{place}. {name} — {score}" for place, (name, score) in enumerate(self.leaderboard(top), 1)]
+        return "🏆 Reyting:\n" + "\n".join(lines) if lines else ""
+
+class GroupQuizHandlers:
+    """Guruh viktorinasi: bitta savol xabari, javoblar xotirada hisoblanadi"""
+    
+    def __init__(self, db: AsyncDatabaseManager, questions_cache: BankCache,
+                 edit_interval: float = GROUP_LEADERBOARD_INTERVAL):
+        self.db = db
+        self.questions_cache = questions_cache
+        self.edit_interval = edit_interval
+        self.games = {}
+    
+    async def can_control(self, game: GroupGame, user_id: int) -> bool:
+        return user_id == game.host_id or await self.db.is_admin(user_id)
+    
+    async def group_quiz_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/groupquiz [fan ID] [savollar soni] - guruhda viktorina boshlash"""
+        try:
+            chat = update.effective_chat
+            user_id = update.message.from_user.id
+            
+            if chat.type not in ('group', 'supergroup'):
+                await update.message.reply_text("❌ Bu buyruq faqat guruhlarda ishlaydi.")
+                return
+            if not await self.db.is_admin(user_id):
+                await update.message.reply_text("❌ Siz admin emassiz!")
+                return
+            if chat.id in self.games:
+                await update.message.reply_text("⚠️ Bu guruhda viktorina davom etmoqda. To'xtatish: /groupstop")
+                return
+            
+            if not context.args or not context.args[0].isdigit():
+                subjects = await self.db.get_subjects()
+                text = "ℹ️ Foydalanish: /groupquiz [fan ID] [savollar soni]\n\n📚 Fanlar:\n"
+                text += "\n".join(f"• {subject_id}: {name}" for subject_id, name in subjects)
+                await update.message.reply_text(text)
+                return
+            
+            subject_id = int(context.args[0])
+            count = int(context.args[1]) if len(context.args) > 1 and context.args[1].isdigit() else 10
+            
+            subject = await self.db.get_subject_file(subject_id)
+            if not subject:
+                await update.message.reply_text("❌ Fan topilmadi!")
+                return
+            subject_name, file_path = subject
+            
+            all_questions, _ = await self.questions_cache.load(subject_id, file_path)
+            question_ids = [i for i in all_questions.ids if all_questions.option_count(i) >= 2]
+            if not question_ids:
+                await update.message.reply_text("❌ Faylda to'g'ri formatdagi savollar topilmadi!")
+                return
+            question_ids = random.sample(question_ids, min(count, len(question_ids)))
+            
+            game = GroupGame(chat.id, user_id, subject_id, subject_name, all_questions, question_ids)
+            self.games[chat.id] = game
+            
+            await update.message.reply_text(
+                f"🎯 Guruh viktorinasi boshlandi!\n\n"
+                f"📖 Fan: {subject_name}\n"
+                f"🔢 Savollar: {len(question_ids)} ta\n\n"
+                f"Har bir savolga bir marta javob berish mumkin. "
+                f"Keyingi savolga o'tish - viktorina boshlovchisi tomonidan."
+            )
+            await self.send_question(context, game)
+            
+        except Exception as e:
+            logger.error(f"Group quiz start error: {e}")
+            self.games.pop(update.effective_chat.id, None)
+            await update.message.reply_text("❌ Xatolik yuz berdi. Iltimos, qayta urinib ko'ring.")
+    
+    async def send_question(self, context: ContextTypes.DEFAULT_TYPE, game: GroupGame):
+        """Joriy savolni guruhga yuborish"""
+        question, permutation = game.question()
+        game.options_text = "\n".join(f"{chr(65 + i)}) {question.options[option_index][:200]}"
+                                      for i, option_index in enumerate(permutation))
+        
+        keyboard = [
+            [InlineKeyboardButton(chr(65 + i), callback_data=f"g_{game.nonce}_{game.current}_{i}")
+             for i in range(len(permutation))],
+            [InlineKeyboardButton("⏭ Keyingi savol", callback_data=f"gnext_{game.nonce}_{game.current}")]
+        ]
+        game.reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        try:
+            message = await context.bot.send_message(
+                chat_id=game.chat_id,
+                text=self.live_text(game),
+                reply_markup=game.reply_markup
+            )
+        except Exception:
+            # Savol yuborilmasa o'yin osilib qolmasin: yopilgan savollar bilan yakunlanadi
+            del game.question_ids[game.current:]
+            if game.question_ids:
+                await self.finish(context, game)
+            else:
+                self.games.pop(game.chat_id, None)
+            raise
+        game.message_id = message.message_id
+        game.last_edit = time.monotonic()
+    
+    @staticmethod
+    def live_text(game: GroupGame) -> str:
+        tail = f"\n\n{game.options_text}\n\n👥 Javoblar: {game.answer_count}"
+        leaderboard = game.leaderboard_text()
+        if leaderboard:
+            tail += f"\n\n{leaderboard}"
+        question, _ = game.question()
+        return fit_message(f"❓ Savol ({game.current + 1}/{len(game.question_ids)})\n\n", question.question, tail)
+    
+    async def handle_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Guruh a'zosining javobi: faqat hisoblagichlar yangilanadi"""
+        try:
+            query = update.callback_query
+            _, nonce, question_index, choice = query.data.split('_')
+            
+            game = self.games.get(query.message.chat.id)
+            if game is None or game.nonce != int(nonce) or game.current != int(question_index):
+                await query.answer("Bu savol yopilgan!")
+                return
+            
+            question, permutation = game.question()
+            choice = int(choice)
+            if choice >= len(permutation):
+                await query.answer("Xato: Noto'g'ri format!", show_alert=True)
+                return
+            
+            user = query.from_user
+            if not game.answer(user.id, user.first_name, choice, permutation[choice] == question.correct_answer):
+                await query.answer("Javobingiz allaqachon qabul qilingan!")
+                return
+            
+            # Natija savol yopilganda ko'rsatiladi
+            await query.answer(f"Javobingiz qabul qilindi: {chr(65 + choice)}")
+            self.schedule_edit(context, game)
+            
+        except Exception as e:
+            logger.error(f"Group answer error: {e}")
+            await update.callback_query.answer("Xatolik yuz berdi!", show_alert=True)
+    
+    def schedule_edit(self, context: ContextTypes.DEFAULT_TYPE, game: GroupGame):
+        """Reyting tahririni edit_interval dan tez-tez bo'lmaydigan qilib rejalashtirish"""
+        if game.edit_task is not None:
+            return
+        delay = max(0.0, game.last_edit + self.edit_interval - time.monotonic())
+        game.edit_task = asyncio.create_task(self._delayed_edit(context.bot, game, game.current, delay))
+    
+    async def _delayed_edit(self, bot, game: GroupGame, question_index: int, delay: float):
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            game.edit_task = None
+        if game.current != question_index or game.message_id is None:
+            return
+        
+        game.last_edit = time.monotonic()
+        try:
+            await bot.edit_message_text(
+                chat_id=game.chat_id,
+                message_id=game.message_id,
+                text=self.live_text(game),
+                reply_markup=game.reply_markup
+            )
+        except Exception as e:
+            logger.warning(f"Guruh reytingini yangilab bo'lmadi: {e}")
+    
+    async def handle_next(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Joriy savolni yopib, keyingisini yuborish (boshlovchi yoki admin)"""
+        try:
+            query = update.callback_query
+            _, nonce, question_index = query.data.split('_')
+            
+            game = self.games.get(query.message.chat.id)
+            if game is None or game.nonce != int(nonce) or game.current != int(question_index):
+                await query.answer("Bu savol yopilgan!")
+                return
+            if not await self.can_control(game, query.from_user.id):
+                await query.answer("Faqat viktorina boshlovchisi keyingi savolga o'tkaza oladi!", show_alert=True)
+                return
+            
+            await query.answer()
+            await self.close_question(context, game)
+            game.next_question()
+            if game.current >= len(game.question_ids):
+                await self.finish(context, game)
+            else:
+                await self.send_question(context, game)
+                
+        except Exception as e:
+            logger.error(f"Group next error: {e}")
+            await update.callback_query.answer("Xatolik yuz berdi!", show_alert=True)
+    
+    async def close_question(self, context: ContextTypes.DEFAULT_TYPE, game: GroupGame):
+        """Savol xabarida to'g'ri javob va javoblar taqsimotini ko'rsatish"""
+        if game.edit_task is not None:
+            game.edit_task.cancel()
+            game.edit_task = None
+        
+        if game.message_id is None:
+            return
+        
+        question, permutation = game.question()
+        lines = [""]
+        for i, option_index in enumerate(permutation):
+            mark = " ✅" if option_index == question.correct_answer else ""
+            lines.append(f"{chr(65 + i)}) {question.options[option_index][:200]} — {game.counts[i]} ta{mark}")
+        lines.append(f"\n👥 Javoblar: {game.answer_count}")
+        
+        try:
+            await context.bot.edit_message_text(
+                chat_id=game.chat_id,
+                message_id=game.message_id,
+                text=fit_message(f"❓ Savol ({game.current + 1}/{len(game.question_ids)})\n\n",
+                                 question.question, "\n" + "\n".join(lines))
+            )
+        except Exception as e:
+            # Tahrir xatosi o'yinni keyingi savolga o'tish yoki yakunlashdan to'xtatmaydi
+            logger.warning(f"Guruh savolini yopib bo'lmadi: {e}")
+    
+    async def finish(self, context: ContextTypes.DEFAULT_TYPE, game: GroupGame):
+        """Yakuniy reyting va barcha natijalarni bitta so'rov bilan bazaga yozish"""
+        self.games.pop(game.chat_id, None)
+        total = len(game.question_ids)
+        
+        rows = []
+        for slot, user_id in enumerate(game.user_ids):
+            score = game.scores[slot]
+            rows.append((user_id, game.names[slot], game.subject_id, score, total,
+                         round(score / total * 100, 1), game.game_id))
+        if rows:
+            await self.db.save_results(rows, wait=True)
+        
+        text = (f"🏁 GURUH VIKTORINASI YAKUNLANDI!\n\n"
+                f"📖 Fan: {game.subject_name}\n"
+                f"🔢 Savollar: {total} ta\n"
+                f"👥 Ishtirokchilar: {len(rows)} ta")
+        leaderboard = game.leaderboard_text()
+        if leaderboard:
+            text += f"\n\n{leaderboard}"
+        await context.bot.send_message(chat_id=game.chat_id, text=text)
+    
+    async def group_stop_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/groupstop - viktorinani muddatidan oldin yakunlash"""
+        try:
+            game = self.games.get(update.effective_chat.id)
+            if game is None:
+                await update.message.reply_text("ℹ️ Bu guruhda faol viktorina yo'q.")
+                return
+            if not await self.can_control(game, update.message.from_user.id):
+                await update.message.reply_text("❌ Faqat viktorina boshlovchisi to'xtata oladi!")
+                return
+            
+            await self.close_question(context, game)
+            # Yopilgan savol ham hisobga olinadi
+            del game.question_ids[game.current + 1:]
+            await self.finish(context, game)
+            
+        except Exception as e:
+            logger.error(f"Group stop error: {e}")
+            await update.message.reply_text("❌ Xatolik yuz berdi. Iltimos, qayta urinib ko'ring.")
+    
+    def get_handlers(self):
+        """Handlerlarni qaytarish"""
+        return [
+            CommandHandler("groupquiz", self.group_quiz_command),
+            CommandHandler("groupstop", self.group_stop_command),
+        ]
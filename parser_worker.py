@@ -0,0 +1,48 @@
+# Fayl tahlili uchun alohida jarayon (BankLoader ishga tushiradi):
+#   python parser_worker.py <fayl>
+# Natija stdout ga bitta JSON obyekt sifatida yoziladi: {"bank_path": ...},
+# kesh papkasiga yozib bo'lmasa {"questions": [...], "version": ...},
+# xatolikda {"error": ...}.
+import os
+import sys
+import json
+from config import PARSER_MEMORY_LIMIT, PARSER_MAX_UNZIPPED_BYTES
+from file_parser import FileParser
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def apply_limits():
+    if resource is not None and PARSER_MEMORY_LIMIT:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (PARSER_MEMORY_LIMIT, PARSER_MEMORY_LIMIT))
+        except (ValueError, OSError):
+            pass
+    # Talabalarga javob beradigan bot jarayonidan keyin navbatda tursin
+    if hasattr(os, 'nice'):
+        os.nice(10)
+
+def compile_file(file_path: str) -> dict:
+    FileParser.check_archive_size(file_path, PARSER_MAX_UNZIPPED_BYTES)
+    # Tahlil xatoliklari (MemoryError ham) main ga yetib boradi va keshga yozilmaydi
+    bank_path, questions = FileParser.compile_bank_file(file_path, strict=True)
+    if bank_path is not None:
+        return {'bank_path': bank_path}
+    
+    # Kesh papkasiga yozib bo'lmasa, o'sha tahlil natijasi to'g'ridan-to'g'ri qaytariladi
+    return {'questions': questions, 'version': FileParser.bank_version(questions)}
+
+def main(argv):
+    apply_limits()
+    try:
+        result = compile_file(argv[0])
+    except MemoryError:
+        result = {'error': "tahlil uchun ajratilgan xotira yetmadi"}
+    except Exception as e:
+        result = {'error': str(e) or type(e).__name__}
+    sys.stdout.write(json.dumps(result, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
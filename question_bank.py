@@ -0,0 +1,321 @@
+import sys
+import json
+import mmap
+import struct
+import hashlib
+from difflib import SequenceMatcher
+from array import array
+
+# Kompilyatsiya qilingan bank fayli (.qbank), barcha sonlar little-endian:
+#   sarlavha: magic, format versiyasi, bank versiyasi, savollar soni,
+#             variantlar havolalari soni, havolalar va matnlar boshlanishi
+#   indeks:   har savol uchun (matn ofseti, matn uzunligi, birinchi variant,
+#             to'g'ri javob, variantlar soni)
+#   xeshlar:  har savol mazmunining 8 baytli xeshi (question_hash)
+#   havolalar: har bir variant uchun matnlar ichidagi (ofset, uzunlik)
+#   matnlar:  UTF-8 satrlar
+BANK_MAGIC = b'QBNK'
+BANK_FORMAT = 2
+_HEADER = struct.Struct('<4sHxx16sIIII')
+_INDEX = struct.Struct('<IIIHH')
+_REF = struct.Struct('<II')
+HASH_SIZE = 8
+
+def question_hash(question: str, options, correct_answer: int) -> bytes:
+    """Savol mazmuni xeshi (matn, variantlar va to'g'ri javob)"""
+    record = json.dumps([question, list(options), correct_answer], ensure_ascii=False)
+    return hashlib.blake2b(record.encode('utf-8'), digest_size=HASH_SIZE).digest()
+
+class Question:
+    """Bankdagi bitta savol (o'zgarmas yozuv)"""
+    __slots__ = ('question', 'options', 'correct_answer')
+    
+    def __init__(self, question: str, options: tuple, correct_answer: int):
+        object.__setattr__(self, 'question', question)
+        object.__setattr__(self, 'options', options)
+        object.__setattr__(self, 'correct_answer', correct_answer)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("Savol o'zgarmas: bank barcha sessiyalar uchun umumiy")
+    
+    def __delattr__(self, name):
+        raise AttributeError("Savol o'zgarmas: bank barcha sessiyalar uchun umumiy")
+    
+    def __repr__(self):
+        return f"Question({self.question!r}, {self.options!r}, {self.correct_answer})"
+
+class QuestionBank:
+    """Fan savollari uchun ixcham, o'zgarmas bank.
+
+    Savol matnlari bitta kortejda, variantlar esa takrorlanmaydigan (intern
+    qilingan) satrlar jadvalida saqlanadi; har savolning variantlari jadvaldagi
+    indekslar bo'lagi (offsets massivi) orqali topiladi. bank[i] O(1) da
+    Question yozuvini qaytaradi.
+    """
+    __slots__ = ('_questions', '_offsets', '_option_ids', '_option_table', '_correct', '_hashes')
+    
+    def __init__(self, questions=()):
+        texts = []
+        offsets = array('I', [0])
+        option_ids = array('I')
+        correct = array('H')
+        hashes = bytearray()
+        table = {}
+        
+        for q in questions:
+            texts.append(q['question'])
+            hashes += question_hash(q['question'], q['options'], q.get('correct_answer', 0))
+            for option in q['options']:
+                option_id = table.get(option)
+                if option_id is None:
+                    option_id = table[option] = len(table)
+                option_ids.append(option_id)
+            offsets.append(len(option_ids))
+            correct.append(q.get('correct_answer', 0))
+        
+        self._questions = tuple(texts)
+        self._offsets = offsets
+        self._option_ids = option_ids
+        self._option_table = tuple(sys.intern(option) for option in table)
+        self._correct = correct
+        self._hashes = bytes(hashes)
+    
+    def __len__(self):
+        return len(self._questions)
+    
+    def __getitem__(self, index: int) -> Question:
+        if index < 0:
+            index += len(self._questions)
+        if not 0 <= index < len(self._questions):
+            raise IndexError("savol indeksi bank chegarasidan tashqarida")
+        table = self._option_table
+        options = tuple(table[i] for i in self._option_ids[self._offsets[index]:self._offsets[index + 1]])
+        return Question(self._questions[index], options, self._correct[index])
+    
+    def __iter__(self):
+        for index in range(len(self._questions)):
+            yield self[index]
+    
+    def option_count(self, index: int) -> int:
+        """Savol variantlari soni (yozuv yaratmasdan)"""
+        return self._offsets[index + 1] - self._offsets[index]
+    
+    def content_hashes(self) -> list:
+        """Har bir savol mazmuni xeshi (question_hash), bank tartibida"""
+        return [self._hashes[i:i + HASH_SIZE] for i in range(0, len(self._hashes), HASH_SIZE)]
+    
+    def to_dicts(self) -> list:
+        """Oddiy lug'atlar ro'yxati (kesh fayllari va versiya xeshi uchun)"""
+        return [
+            {'question': q.question, 'options': list(q.options), 'correct_answer': q.correct_answer}
+            for q in self
+        ]
+    
+    @property
+    def nbytes(self) -> int:
+        """Bank egallagan xotiraning taxminiy hajmi (baytlarda)"""
+        size = sys.getsizeof(self._questions) + sys.getsizeof(self._option_table)
+        size += sum(sys.getsizeof(text) for text in self._questions)
+        size += sum(sys.getsizeof(option) for option in self._option_table)
+        for arr in (self._offsets, self._option_ids, self._correct, self._hashes):
+            size += sys.getsizeof(arr)
+        return size
+    
+    def __getstate__(self):
+        return (self._questions, self._offsets, self._option_ids, self._option_table, self._correct, self._hashes)
+    
+    def __setstate__(self, state):
+        questions, offsets, option_ids, option_table, correct, hashes = state
+        self._questions = questions
+        self._offsets = offsets
+        self._option_ids = option_ids
+        # Jarayonlar pulidan kelganda ham umumiy variantlar bitta obyekt bo'lsin
+        self._option_table = tuple(sys.intern(option) for option in option_table)
+        self._correct = correct
+        self._hashes = hashes
+
+
+def write_bank_file(path: str, questions: list, version: str):
+    """Savollarni .qbank formatida yozish (MappedQuestionBank uchun)"""
+    blob = bytearray()
+    strings = {}
+    
+    def add_string(text):
+        ref = strings.get(text)
+        if ref is None:
+            data = text.encode('utf-8')
+            ref = strings[text] = (len(blob), len(data))
+            blob.extend(data)
+        return ref
+    
+    index = bytearray()
+    hashes = bytearray()
+    option_refs = []
+    for q in questions:
+        text_offset, text_length = add_string(q['question'])
+        first_option = len(option_refs)
+        for option in q['options']:
+            # Takroriy matnlar blobda bir marta saqlanadi
+            option_refs.append(add_string(option))
+        index += _INDEX.pack(text_offset, text_length, first_option,
+                             q.get('correct_answer', 0), len(option_refs) - first_option)
+        hashes += question_hash(q['question'], q['options'], q.get('correct_answer', 0))
+    
+    refs = b''.join(_REF.pack(offset, length) for offset, length in option_refs)
+    refs_offset = _HEADER.size + len(index) + len(hashes)
+    blob_offset = refs_offset + len(refs)
+    header = _HEADER.pack(BANK_MAGIC, BANK_FORMAT, version.encode('ascii')[:16].ljust(16, b'\0'),
+                          len(questions), len(option_refs), refs_offset, blob_offset)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(index)
+        f.write(hashes)
+        f.write(refs)
+        f.write(blob)
+
+class MappedQuestionBank:
+    """.qbank faylini mmap orqali o'qiydigan bank (QuestionBank bilan bir xil interfeys).
+    
+    Fayl faqat o'qish uchun xaritalanadi: bir nechta bot jarayoni bir xil
+    sahifa keshini bo'lishadi, savollar esa murojaat qilinganda dekodlanadi.
+    """
+    __slots__ = ('path', 'version', '_mm', '_count', '_refs_offset', '_blob_offset')
+    
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, fmt, version, count, ref_count, refs_offset, blob_offset = _HEADER.unpack_from(self._mm, 0)
+            if magic != BANK_MAGIC or fmt != BANK_FORMAT:
+                raise ValueError(f"noma'lum bank formati: {path}")
+            if (refs_offset != _HEADER.size + count * (_INDEX.size + HASH_SIZE)
+                    or blob_offset != refs_offset + ref_count * _REF.size
+                    or blob_offset > len(self._mm)):
+                raise ValueError(f"bank fayli buzilgan: {path}")
+        except Exception:
+            self._mm.close()
+            raise
+        self.path = path
+        self.version = version.rstrip(b'\0').decode('ascii')
+        self._count = count
+        self._refs_offset = refs_offset
+        self._blob_offset = blob_offset
+    
+    def _string(self, offset: int, length: int) -> str:
+        start = self._blob_offset + offset
+        return self._mm[start:start + length].decode('utf-8')
+    
+    def __len__(self):
+        return self._count
+    
+    def __getitem__(self, index: int) -> Question:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("savol indeksi bank chegarasidan tashqarida")
+        text_offset, text_length, first_option, correct, option_count = _INDEX.unpack_from(
+            self._mm, _HEADER.size + index * _INDEX.size)
+        options = tuple(
+            sys.intern(self._string(*_REF.unpack_from(self._mm, self._refs_offset + i * _REF.size)))
+            for i in range(first_option, first_option + option_count)
+        )
+        return Question(self._string(text_offset, text_length), options, correct)
+    
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+    
+    def option_count(self, index: int) -> int:
+        """Savol variantlari soni (matnlarni dekodlamasdan)"""
+        return _INDEX.unpack_from(self._mm, _HEADER.size + index * _INDEX.size)[4]
+    
+    def content_hashes(self) -> list:
+        """Har bir savol mazmuni xeshi (question_hash), bank tartibida"""
+        start = _HEADER.size + self._count * _INDEX.size
+        return [self._mm[i:i + HASH_SIZE] for i in range(start, start + self._count * HASH_SIZE, HASH_SIZE)]
+    
+    def to_dicts(self) -> list:
+        """Oddiy lug'atlar ro'yxati (kesh fayllari va versiya xeshi uchun)"""
+        return [
+            {'question': q.question, 'options': list(q.options), 'correct_answer': q.correct_answer}
+            for q in self
+        ]
+    
+    @property
+    def nbytes(self) -> int:
+        """Xaritalangan fayl hajmi (jarayonlar o'rtasida umumiy sahifa keshi)"""
+        return len(self._mm)
+    
+    def close(self):
+        self._mm.close()
+
+def assign_question_ids(previous: list, hashes: list):
+    """Yangi bank savollariga barqaror ID berish.
+    
+    previous - oldingi bankdagi (question_id, xesh) juftlari tartib bo'yicha,
+    hashes - yangi bank savollari xeshlari. Mazmuni o'zgarmagan savollar
+    (joyi surilgan bo'lsa ham) eski ID sini saqlaydi, qolganlariga yangi ID
+    beriladi. (ids, saqlanganlar soni) qaytariladi.
+    """
+    old_hashes = [content_hash for _, content_hash in previous]
+    ids = [None] * len(hashes)
+    used = set()
+    
+    matcher = SequenceMatcher(None, old_hashes, hashes, autojunk=False)
+    for old_start, new_start, size in matcher.get_matching_blocks():
+        for offset in range(size):
+            ids[new_start + offset] = previous[old_start + offset][0]
+            used.add(old_start + offset)
+    
+    # Boshqa joyga ko'chirilgan savollar xesh bo'yicha topiladi
+    unused = {}
+    for position, (question_id, content_hash) in enumerate(previous):
+        if position not in used:
+            unused.setdefault(content_hash, []).append(question_id)
+    
+    next_id = max((question_id for question_id, _ in previous), default=-1) + 1
+    kept = 0
+    for position, content_hash in enumerate(hashes):
+        if ids[position] is not None:
+            kept += 1
+        elif unused.get(content_hash):
+            ids[position] = unused[content_hash].pop(0)
+            kept += 1
+        else:
+            ids[position] = next_id
+            next_id += 1
+    return ids, kept
+
+class StableQuestionView:
+    """Bank savollariga barqaror savol ID si orqali murojaat.
+    
+    Sessiyalar va javoblar shu ID larni saqlaydi, shuning uchun fan fayli
+    qayta yuklanganda o'zgarmagan savollar eski sessiyalarda ishlayveradi.
+    """
+    __slots__ = ('bank', 'ids', '_positions')
+    
+    def __init__(self, bank, ids):
+        self.bank = bank
+        self.ids = tuple(ids)
+        self._positions = {question_id: position for position, question_id in enumerate(self.ids)}
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __getitem__(self, question_id: int) -> Question:
+        return self.bank[self._positions[question_id]]
+    
+    def __contains__(self, question_id: int) -> bool:
+        return question_id in self._positions
+    
+    def items(self):
+        """(savol ID, savol) juftlari bank tartibida"""
+        for position, question_id in enumerate(self.ids):
+            yield question_id, self.bank[position]
+    
+    def option_count(self, question_id: int) -> int:
+        return self.bank.option_count(self._positions[question_id])
+    
+    @property
+    def nbytes(self) -> int:
+        return self.bank.nbytes + sys.getsizeof(self.ids) + sys.getsizeof(self._positions)
@@ -0,0 +1,258 @@
+import time
+import random
+import asyncio
+import logging
+from collections import OrderedDict
+from config import (SESSION_CACHE_SIZE, SESSION_CHECKPOINT_EVERY,
+                    SESSION_IDLE_TIMEOUT, SESSION_CHECKPOINT_INTERVAL)
+from database import AsyncDatabaseManager
+
+logger = logging.getLogger(__name__)
+
+def option_permutation(session: dict, question_index: int, option_count: int) -> list:
+    """Savol variantlari tartibi: sessiya seed'i va savol o'rnidan takrorlanuvchan hisoblanadi"""
+    if session.get('seed') is None and session.get('permutations'):
+        # Seed'dan oldingi sessiyalar tartibni to'liq saqlagan
+        return session['permutations'][question_index]
+    permutation = list(range(option_count))
+    random.Random((session['seed'] << 32) | question_index).shuffle(permutation)
+    return permutation
+
+class PollIndex:
+    """Yuborilgan viktorina so'rovnomalari: poll_id -> (foydalanuvchi, fan, sessiya nonce'i, savol o'rni).
+
+    Faqat xotirada saqlanadi; eng eski yozuvlar max_entries dan oshganda
+    chiqariladi. Indeksda yo'q so'rovnomaga (masalan, qayta ishga
+    tushishdan oldin yuborilgan) javob berilsa, sessiyaning joriy savoli
+    yangi viktorina sifatida qayta yuboriladi.
+    """
+    
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._polls = OrderedDict()
+        self._open = {}
+    
+    def add(self, poll_id: str, user_id: int, subject_id: int, nonce: int, question_index: int):
+        entry = (user_id, subject_id, nonce, question_index)
+        self._polls[poll_id] = entry
+        self._open[entry] = poll_id
+        if len(self._polls) > self.max_entries:
+            self._forget(*self._polls.popitem(last=False))
+    
+    def get(self, poll_id: str):
+        return self._polls.get(poll_id)
+    
+    def pop(self, poll_id: str):
+        entry = self._polls.pop(poll_id, None)
+        if entry is not None:
+            self._forget(poll_id, entry)
+        return entry
+    
+    def is_open(self, user_id: int, subject_id: int, nonce: int, question_index: int) -> bool:
+        """Sessiya savoli uchun javob kutilayotgan viktorina bormi"""
+        return (user_id, subject_id, nonce, question_index) in self._open
+    
+    def _forget(self, poll_id, entry):
+        if self._open.get(entry) == poll_id:
+            del self._open[entry]
+    
+    def __len__(self):
+        return len(self._polls)
+
+class _CachedSession:
+    __slots__ = ('session', 'answered', 'pending_answers', 'selections', 'dirty', 'last_access')
+    
+    def __init__(self, session, answered):
+        self.session = session
+        self.answered = answered
+        self.pending_answers = []
+        self.selections = {}
+        self.dirty = False
+        self.last_access = time.monotonic()
+
+class SessionCache:
+    """Faol test sessiyalari uchun xotiradagi LRU kesh.
+
+    O'qishlar xotiradan beriladi. Holat bazaga har SESSION_CHECKPOINT_EVERY
+    javobda, harakatsizlik tugaganda, test yakunida va to'xtashda yoziladi;
+    qayta ishga tushganda sessiya oxirgi checkpoint'dan davom etadi.
+    """
+    
+    def __init__(self, db: AsyncDatabaseManager, max_sessions: int = SESSION_CACHE_SIZE,
+                 checkpoint_every: int = SESSION_CHECKPOINT_EVERY, idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        self.db = db
+        self.max_sessions = max_sessions
+        self.checkpoint_every = checkpoint_every
+        self.idle_timeout = idle_timeout
+        self._entries = OrderedDict()
+        self._task = None
+    
+    async def _load(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            entry.last_access = time.monotonic()
+            return entry
+        
+        session = await self.db.get_user_session(*key)
+        if session is None:
+            return None
+        
+        # Parallel yuklangan bo'lsa, birinchisini ishlatish
+        entry = self._entries.get(key)
+        if entry is None:
+            answers = await self.db.get_session_answers(session['session_id'])
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _CachedSession(session, {row[0] for row in answers})
+                self._entries[key] = entry
+                await self._evict_overflow()
+        return entry
+    
+    async def _evict_overflow(self):
+        while len(self._entries) > self.max_sessions:
+            key, entry = self._entries.popitem(last=False)
+            await self._checkpoint(key, entry)
+    
+    async def _checkpoint(self, key, entry):
+        if not entry.dirty:
+            return
+        session = entry.session
+        answers, entry.pending_answers = entry.pending_answers, []
+        entry.dirty = False
+        await self.db.checkpoint_session(key[0], key[1], session['session_id'],
+                                         session['current_question'], session['score'], answers)
+    
+    async def get(self, user_id: int, subject_id: int):
+        """Sessiyani keshdan (bo'lmasa bazadan) olish"""
+        entry = await self._load((user_id, subject_id))
+        return entry.session if entry else None
+    
+    async def start(self, user_id: int, subject_id: int, session: dict):
+        """Yangi sessiyani boshlash (eski sessiya va javoblari o'chiriladi)"""
+        key = (user_id, subject_id)
+        self._entries.pop(key, None)
+        await self.db.delete_user_session(user_id, subject_id)
+        await self.db.save_user_session(user_id, subject_id,
+                                        session['session_id'],
+                                        session['bank_version'],
+                                        session['question_ids'],
+                                        session['seed'],
+                                        session['current_question'],
+                                        session['score'],
+                                        session['total_questions'],
+                                        session.get('permutations'),
+                                        session.get('mode', 'classic'))
+        self._entries[key] = _CachedSession(session, set())
+        await self._evict_overflow()
+    
+    async def record_answer(self, user_id: int, subject_id: int, question_index: int,
+                            question_id: int, selected: int, correct: bool, advance: bool = False) -> bool:
+        """Javobni qayd etish (advance=True - keyingi savolga ham o'tish). Savolga avval javob berilgan bo'lsa False"""
+        key = (user_id, subject_id)
+        entry = await self._load(key)
+        if entry is None or question_index in entry.answered:
+            return False
+        
+        entry.answered.add(question_index)
+        entry.pending_answers.append((question_index, question_id, selected, correct))
+        if correct:
+            entry.session['score'] += 1
+        if advance:
+            # O'tish checkpoint'dan oldin: bazada javob va keyingi savol o'rni birga yoziladi
+            entry.session['current_question'] += 1
+        entry.dirty = True
+        
+        if len(entry.pending_answers) >= self.checkpoint_every:
+            await self._checkpoint(key, entry)
+        return True
+    
+    async def page_selections(self, user_id: int, subject_id: int):
+        """Joriy sahifada tanlangan variantlar {savol o'rni: variant} (faqat xotirada)"""
+        entry = await self._load((user_id, subject_id))
+        return entry.selections if entry else None
+    
+    async def record_page(self, user_id: int, subject_id: int, start: int, answers: list, next_question: int):
+        """Sahifa javoblarini bitta checkpoint bilan yozish. Sahifa allaqachon yuborilgan bo'lsa None"""
+        key = (user_id, subject_id)
+        entry = await self._load(key)
+        if entry is None or entry.session['current_question'] != start:
+            return None
+        
+        for question_index, question_id, selected, correct in answers:
+            if question_index in entry.answered:
+                continue
+            entry.answered.add(question_index)
+            entry.pending_answers.append((question_index, question_id, selected, correct))
+            if correct:
+                entry.session['score'] += 1
+        entry.session['current_question'] = next_question
+        entry.selections = {}
+        entry.dirty = True
+        await self._checkpoint(key, entry)
+        return entry.session
+    
+    async def advance(self, user_id: int, subject_id: int):
+        """Keyingi savolga o'tish"""
+        entry = await self._load((user_id, subject_id))
+        if entry is None:
+            return None
+        entry.session['current_question'] += 1
+        entry.dirty = True
+        return entry.session
+    
+    async def skip_answered(self, user_id: int, subject_id: int):
+        """Javob berilgan savollarni o'tkazib yuborib, sessiyani qaytarish"""
+        entry = await self._load((user_id, subject_id))
+        if entry is None:
+            return None
+        # Checkpoint'dan tiklangan sessiya javob berilgan savolda to'xtagan bo'lishi mumkin
+        while entry.session['current_question'] in entry.answered:
+            entry.session['current_question'] += 1
+            entry.dirty = True
+        return entry.session
+    
+    async def finish(self, user_id: int, subject_id: int):
+        """Test yakunida holatni bazaga yozib, keshdan chiqarish"""
+        key = (user_id, subject_id)
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            await self._checkpoint(key, entry)
+    
+    async def delete(self, user_id: int, subject_id: int, keep_answers: bool = False):
+        """Sessiyani keshdan va bazadan o'chirish"""
+        self._entries.pop((user_id, subject_id), None)
+        await self.db.delete_user_session(user_id, subject_id, keep_answers)
+    
+    async def checkpoint_idle(self):
+        """Harakatsiz sessiyalarni bazaga yozib, keshdan chiqarish"""
+        now = time.monotonic()
+        idle = [key for key, entry in self._entries.items() if now - entry.last_access >= self.idle_timeout]
+        for key in idle:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                await self._checkpoint(key, entry)
+        if idle:
+            logger.info(f"{len(idle)} ta harakatsiz sessiya bazaga qaytarildi")
+    
+    async def _run_checkpointer(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.checkpoint_idle()
+            except Exception as e:
+                logger.error(f"Sessiyalarni checkpoint qilishda xatolik: {e}")
+    
+    def start_checkpointer(self, interval: float = SESSION_CHECKPOINT_INTERVAL):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_checkpointer(interval))
+    
+    async def close(self):
+        """To'xtashda barcha o'zgargan sessiyalarni bazaga yozish"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while self._entries:
+            key, entry = self._entries.popitem(last=False)
+            await self._checkpoint(key, entry)
+        await self.db.flush()
@@ -1,18 +1,129 @@
 import os
+import json
 import random
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes, CallbackQueryHandler, CommandHandler
-from database import DatabaseManager
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
+from telegram.ext import ContextTypes, CallbackQueryHandler, CommandHandler, PollAnswerHandler
+from config import QUESTIONS_PER_PAGE, PAGE_TEXT_LIMIT, WEBAPP_URL
+from database import AsyncDatabaseManager
+from session_cache import SessionCache, PollIndex, option_permutation
+from callback_signer import CallbackSigner, ReplayGuard, session_nonce, PAGE_PREFIX
+from bank_cache import BankCache
 from file_parser import FileParser
 
 logger = logging.getLogger(__name__)
 
+# Test rejimlari: (kalit, tugma matni)
+TEST_MODES = [
+    ('classic', "📝 Oddiy"),
+    ('fast', "⚡ Tezkor"),
+    ('paged', "📄 Sahifali"),
+    ('poll', "🗳 Viktorina"),
+]
+if WEBAPP_URL:
+    TEST_MODES.append(('webapp', "🖥 Mini App"))
+
+# Telegram viktorina cheklovlari
+POLL_QUESTION_LIMIT = 300
+POLL_OPTION_LIMIT = 100
+POLL_MAX_OPTIONS = 10
+
 class UserHandlers:
-    def __init__(self, db: DatabaseManager):
+    def __init__(self, db: AsyncDatabaseManager, questions_cache: BankCache):
         self.db = db
+        self.sessions = SessionCache(db)
         self.file_parser = FileParser()
-        self.questions_cache = {}
+        self.questions_cache = questions_cache
+        self.signer = CallbackSigner()
+        self.answered_taps = ReplayGuard()
+        self.polls = PollIndex()
+    
+    async def load_questions(self, subject_id: int, file_path: str):
+        """Fan savollari va bank versiyasini keshdan yoki fayldan olish"""
+        # Tahlil jarayonlar pulida bajariladi, fayl almashtirilsa kesh yangilanadi
+        return await self.questions_cache.load(subject_id, file_path)
+    
+    async def get_session_questions(self, subject_id: int, session: dict):
+        """Sessiya savollari bankini qaytarish (sessiya savollari bankdan o'chgan bo'lsa None)"""
+        # Tugma bosilganda baza va fayl tekshirilmaydi: bank manbai keshdagi sessiyada (bazaga yozilmaydi).
+        # Fan qayta yuklansa yoki bank keshdan chiqarilsa, manba mos kelmaydi va fayl qayta tekshiriladi
+        cached = self.questions_cache.cached(subject_id, session.get('bank_source'))
+        if cached is not None:
+            all_questions, bank_version = cached
+        else:
+            subject = await self.db.get_subject_file(subject_id)
+            if not subject:
+                return None
+            all_questions, bank_version = await self.load_questions(subject_id, subject[1])
+            session['bank_source'] = self.questions_cache.source(subject_id)
+        
+        if bank_version != session['bank_version']:
+            # Fayl qayta yuklangan: o'zgarmagan savollar barqaror ID si bilan qoladi
+            if not all(question_id in all_questions for question_id in session['question_ids']):
+                logger.warning(f"Fan {subject_id} savollari o'zgargan, sessiya eskirgan")
+                return None
+            session['bank_version'] = bank_version
+        return all_questions
+    
+    async def migrate_legacy_sessions(self):
+        """Eski (to'liq JSON) sessiyalarni savollar ID lariga o'tkazish"""
+        legacy_sessions = await self.db.get_legacy_sessions()
+        if legacy_sessions is None:
+            return
+        
+        migrated = 0
+        for user_id, subject_id, questions_json, current_question, answers_json, score, total_questions in legacy_sessions:
+            try:
+                subject = await self.db.get_subject_file(subject_id)
+                if not subject or not os.path.exists(subject[1]):
+                    continue
+                
+                all_questions, bank_version = await self.load_questions(subject_id, subject[1])
+                positions = {}
+                for question_id, q in all_questions.items():
+                    positions.setdefault((q.question, q.options), question_id)
+                
+                legacy_questions = json.loads(questions_json)
+                legacy_answers = json.loads(answers_json)
+                question_ids = []
+                permutations = []
+                for q in legacy_questions:
+                    index = positions.get((q['question'], tuple(q['options'])))
+                    if index is None:
+                        raise ValueError("savol bankda topilmadi")
+                    question_ids.append(index)
+                    
+                    permutation = q.get('shuffled_indices')
+                    if not permutation or sorted(permutation) != list(range(len(q['options']))):
+                        permutation = list(range(len(q['options'])))
+                        random.shuffle(permutation)
+                    permutations.append(permutation)
+                
+                # Ball javoblar jurnalidan qayta yig'iladi
+                session_id = random.getrandbits(63)
+                await self.db.save_user_session(user_id, subject_id,
+                                          session_id,
+                                          bank_version,
+                                          question_ids,
+                                          None,
+                                          current_question,
+                                          0,
+                                          total_questions,
+                                          permutations)
+                
+                # Javoblar ketma-ket yozilgan: k-javob k-savolga tegishli
+                for k, answer in enumerate(legacy_answers[:len(question_ids)]):
+                    question = all_questions[question_ids[k]]
+                    if answer.get('selected_text') in question.options:
+                        selected = question.options.index(answer['selected_text'])
+                        await self.db.record_answer(session_id, user_id, subject_id, k, question_ids[k],
+                                              selected, selected == question.correct_answer)
+                migrated += 1
+            except Exception as e:
+                logger.warning(f"Sessiyani ko'chirib bo'lmadi (user {user_id}, fan {subject_id}): {e}")
+        
+        await self.db.drop_legacy_sessions()
+        logger.info(f"{migrated}/{len(legacy_sessions)} ta eski sessiya ko'chirildi")
     
     async def user_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Foydalanuvchi uchun start handler"""
@@ -27,6 +138,7 @@ class UserHandlers:
             
             reply_markup = InlineKeyboardMarkup(keyboard)
             await update.message.reply_text(text, reply_markup=reply_markup)
+            await self.resume_polls(context, user_id)
             
         except Exception as e:
             logger.error(f"Start command error: {e}")
@@ -38,7 +150,7 @@ class UserHandlers:
             query = update.callback_query
             await query.answer()
             
-            subjects = self.db.get_subjects()
+            subjects = await self.db.get_subjects()
             
             if not subjects:
                 keyboard = [[InlineKeyboardButton("🔙 Orqaga", callback_data="main_menu")]]
@@ -75,30 +187,62 @@ class UserHandlers:
             subject_id = int(query.data.split('_')[1])
             
             context.user_data['selected_subject_id'] = subject_id
-            
-            # Test sonini so'rash
-            keyboard = [
-                [InlineKeyboardButton("10 ta", callback_data=f"count_10_{subject_id}")],
-                [InlineKeyboardButton("20 ta", callback_data=f"count_20_{subject_id}")],
-                [InlineKeyboardButton("30 ta", callback_data=f"count_30_{subject_id}")],
-                [InlineKeyboardButton("40 ta", callback_data=f"count_40_{subject_id}")],
-                [InlineKeyboardButton("60 ta", callback_data=f"count_60_{subject_id}")],
-                [InlineKeyboardButton("Hammasi", callback_data=f"count_all_{subject_id}")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            subject_name = self.db.get_subject_file(subject_id)[0]
-            await query.edit_message_text(
-                f"📖 Tanlangan fan: {subject_name}\n\n"
-                f"🔢 Nechta test ishlamoqchisiz?\n\n"
-                f"ℹ️ Eslatma: Agar faylda kamroq savol bo'lsa, mavjud savollar soni ko'rsatiladi.",
-                reply_markup=reply_markup
-            )
+            await self.show_count_menu(query, context, subject_id)
             
         except Exception as e:
             logger.error(f"Subject selection error: {e}")
             await update.callback_query.edit_message_text("❌ Xatolik yuz berdi. Iltimos, qayta urinib ko'ring.")
     
+    async def show_count_menu(self, query, context: ContextTypes.DEFAULT_TYPE, subject_id: int):
+        """Testlar soni va rejimini tanlash menyusi"""
+        mode = context.user_data.get('test_mode', 'classic')
+        
+        # Test sonini so'rash
+        keyboard = [
+            [InlineKeyboardButton("10 ta", callback_data=f"count_10_{subject_id}")],
+            [InlineKeyboardButton("20 ta", callback_data=f"count_20_{subject_id}")],
+            [InlineKeyboardButton("30 ta", callback_data=f"count_30_{subject_id}")],
+            [InlineKeyboardButton("40 ta", callback_data=f"count_40_{subject_id}")],
+            [InlineKeyboardButton("60 ta", callback_data=f"count_60_{subject_id}")],
+            [InlineKeyboardButton("Hammasi", callback_data=f"count_all_{subject_id}")],
+            [InlineKeyboardButton(f"✅ {label}" if key == mode else label, callback_data=f"mode_{key}_{subject_id}")
+             for key, label in TEST_MODES]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        subject_name = (await self.db.get_subject_file(subject_id))[0]
+        await query.edit_message_text(
+            f"📖 Tanlangan fan: {subject_name}\n\n"
+            f"🔢 Nechta test ishlamoqchisiz?\n\n"
+            f"ℹ️ Eslatma: Agar faylda kamroq savol bo'lsa, mavjud savollar soni ko'rsatiladi.\n"
+            f"⚡ Tezkor rejimda javob natijasi va keyingi savol bitta xabarda ko'rsatiladi.\n"
+            f"📄 Sahifali rejimda bir xabarda {QUESTIONS_PER_PAGE} tagacha savol bo'ladi, "
+            f"javoblar sahifa yuborilganda tekshiriladi.\n"
+            f"🗳 Viktorina rejimida savollar Telegram viktorinasi sifatida yuboriladi."
+            + ("\n🖥 Mini App rejimida test ilovada ishlanadi, javoblar oxirida bir marta yuboriladi."
+               if WEBAPP_URL else ""),
+            reply_markup=reply_markup
+        )
+    
+    async def handle_mode_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Test rejimini tanlash (foydalanuvchi uchun eslab qolinadi)"""
+        try:
+            query = update.callback_query
+            await query.answer()
+            
+            _, mode, subject_id = query.data.split('_')
+            if mode not in dict(TEST_MODES):
+                return
+            if context.user_data.get('test_mode', 'classic') == mode:
+                return
+            
+            context.user_data['test_mode'] = mode
+            await self.show_count_menu(query, context, int(subject_id))
+            
+        except Exception as e:
+            logger.error(f"Mode selection error: {e}")
+            await update.callback_query.answer("Xatolik yuz berdi!", show_alert=True)
+    
     async def handle_question_count(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Testlar sonini tanlash"""
         try:
@@ -110,7 +254,7 @@ class UserHandlers:
             count_type = data_parts[1]
             subject_id = int(data_parts[2])
             
-            subject_name, file_path = self.db.get_subject_file(subject_id)
+            subject_name, file_path = await self.db.get_subject_file(subject_id)
             
             # Fayl mavjudligini tekshirish
             if not os.path.exists(file_path):
@@ -121,22 +265,7 @@ class UserHandlers:
                 return
             
             # Savollarni yuklash
-            if subject_id in self.questions_cache:
-                all_questions = self.questions_cache[subject_id]
-            else:
-                # Birinchi oddiy usul
-                all_questions = self.file_parser.parse_file(file_path)
-                
-                # Agar savol topilmasa, tahlil qilish
-                if not all_questions:
-                    logger.warning(f"Faylda savol topilmadi. Tahlil qilinmoqda: {file_path}")
-                    
-                    # Kengaytirilgan usul
-                    all_questions = self.file_parser.parse_docx_advanced(file_path)
-                
-                # Savollarni tekshirish
-                all_questions = self.file_parser.validate_questions(all_questions)
-                self.questions_cache[subject_id] = all_questions
+            all_questions, bank_version = await self.load_questions(subject_id, file_path)
             
             if not all_questions:
                 await query.edit_message_text(
@@ -145,52 +274,20 @@ class UserHandlers:
                 )
                 return
             
-            # Testlar sonini belgilash
-            if count_type == 'all':
-                questions_count = len(all_questions)
-                selected_questions = all_questions
-            else:
-                questions_count = int(count_type)
-                selected_questions = random.sample(all_questions, min(questions_count, len(all_questions)))
-            
-            # Variantlarni tekshirish va to'g'rilash
-            validated_questions = []
-            for q in selected_questions:
-                if len(q['options']) >= 2:  # Kamida 2 ta variant bo'lishi kerak
-                    # Variantlarni tozalash
-                    cleaned_options = []
-                    for opt in q['options']:
-                        if opt and opt.strip():  # Bo'sh bo'lmagan variantlarni qo'shish
-                            cleaned_options.append(opt.strip())
-                    
-                    if len(cleaned_options) >= 2:
-                        q['options'] = cleaned_options
-                        validated_questions.append(q)
-            
-            if not validated_questions:
+            session_data = self.new_session(all_questions, bank_version, count_type,
+                                            context.user_data.get('test_mode', 'classic'))
+            if session_data is None:
                 await query.edit_message_text("❌ Faylda to'g'ri formatdagi savollar topilmadi!")
                 return
+            question_ids = session_data['question_ids']
             
-            # Sessionni boshlash
-            session_data = {
-                'questions': validated_questions,
-                'current_question': 0,
-                'answers': [],
-                'score': 0,
-                'total_questions': len(validated_questions)
-            }
-            
-            self.db.save_user_session(user_id, subject_id, 
-                                    session_data['questions'],
-                                    session_data['current_question'],
-                                    session_data['answers'],
-                                    session_data['score'],
-                                    session_data['total_questions'])
+            # Sessionni boshlash (eski sessiya va uning javoblari o'chiriladi)
+            await self.sessions.start(user_id, subject_id, session_data)
             
             await query.edit_message_text(
                 f"🎯 Test boshlandi!\n\n"
                 f"📖 Fan: {subject_name}\n"
-                f"🔢 Savollar: {len(validated_questions)} ta\n\n"
+                f"🔢 Savollar: {len(question_ids)} ta\n\n"
                 f"📝 Ko'rsatma:\n"
                 f"• Har bir savolga javob bering\n"
                 f"• Darhol natija ko'rsatiladi\n"
@@ -205,10 +302,38 @@ class UserHandlers:
             logger.error(f"Question count selection error: {e}")
             await update.callback_query.edit_message_text("❌ Xatolik yuz berdi. Iltimos, qayta urinib ko'ring.")
     
+    @staticmethod
+    def new_session(all_questions, bank_version: str, count_type: str, mode: str = 'classic'):
+        """Yangi sessiya lug'ati (mos savollar bo'lmasa None)"""
+        # Testlar sonini belgilash (savollarning barqaror ID lari)
+        if count_type == 'all':
+            question_ids = list(all_questions.ids)
+        else:
+            questions_count = int(count_type)
+            question_ids = random.sample(all_questions.ids, min(questions_count, len(all_questions)))
+        
+        # Kamida 2 ta varianti bor savollarni qoldirish
+        question_ids = [i for i in question_ids if all_questions.option_count(i) >= 2]
+        if not question_ids:
+            return None
+        
+        return {
+            'session_id': random.getrandbits(63),
+            'bank_version': bank_version,
+            'question_ids': question_ids,
+            # Variantlar tartibi (seed, savol o'rni) dan hisoblanadi
+            'seed': random.getrandbits(63),
+            'permutations': None,
+            'current_question': 0,
+            'score': 0,
+            'total_questions': len(question_ids),
+            'mode': mode
+        }
+    
     async def send_question(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, subject_id: int):
         """Savolni yuborish"""
         try:
-            session = self.db.get_user_session(user_id, subject_id)
+            session = await self.sessions.skip_answered(user_id, subject_id)
             if not session:
                 await context.bot.send_message(
                     chat_id=user_id,
@@ -217,78 +342,61 @@ class UserHandlers:
                 return
             
             current_q = session['current_question']
-            questions = session['questions']
+            question_ids = session['question_ids']
             
-            if current_q >= len(questions):
+            if current_q >= len(question_ids):
                 await self.show_results(context, user_id, subject_id)
                 return
             
-            question = questions[current_q]
-            
-            # Variantlarni aralashtirish
-            options = question['options'].copy()
-            
-            # Variantlarni aralashtirish va indekslarni saqlash
-            original_indices = list(range(len(options)))
-            random.shuffle(original_indices)
-            
-            shuffled_options = [options[i] for i in original_indices]
-            
-            # To'g'ri javob indeksini topish (aralashtirilgan ro'yxatda)
-            # Har doim birinchi variant (0) to'g'ri javob
-            new_correct_index = original_indices.index(0)
-            
-            logger.info(f"Question {current_q}: original correct index: 0, shuffled correct index: {new_correct_index}")
-            logger.info(f"Original indices: {original_indices}")
-            logger.info(f"Shuffled options: {shuffled_options}")
-            
-            # Aralashtirilgan variantlarni sessionga saqlash
-            session['questions'][current_q]['shuffled_options'] = shuffled_options
-            session['questions'][current_q]['shuffled_indices'] = original_indices
-            session['questions'][current_q]['shuffled_correct_index'] = new_correct_index
+            all_questions = await self.get_session_questions(subject_id, session)
+            if all_questions is None:
+                await self.sessions.delete(user_id, subject_id)
+                await context.bot.send_message(
+                    chat_id=user_id,
+                    text="❌ Fan savollari yangilangan. Iltimos, testni qaytadan boshlang."
+                )
+                return
             
-            # Klaviatura yaratish
-            keyboard = []
-            for i, option in enumerate(shuffled_options):
-                # Uzun variantlarni qisqartirish
-                display_option = option
-                if len(option) > 50:
-                    display_option = option[:50] + "..."
-                
-                keyboard.append([InlineKeyboardButton(
-                    f"{chr(65+i)}) {display_option}", 
-                    callback_data=f"ans_{subject_id}_{current_q}_{i}_{new_correct_index}"
-                )])
+            if session.get('mode') == 'webapp':
+                # Savollar ilovada: bundle URL sessiya va boshlanish o'rniga bog'langan
+                url = (f"{WEBAPP_URL}/?subject={subject_id}&session={session_nonce(session['session_id'])}"
+                       f"&start={current_q}")
+                await context.bot.send_message(
+                    chat_id=user_id,
+                    text=f"🖥 {len(question_ids) - current_q} ta savol Mini App'da. "
+                         f"Javoblar test oxirida bir marta yuboriladi.",
+                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("▶️ Testni ochish", web_app=WebAppInfo(url))]])
+                )
+                return
             
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            if session.get('mode') == 'paged':
+                selections = await self.sessions.page_selections(user_id, subject_id)
+                text, reply_markup = self.build_page_message(user_id, subject_id, session, all_questions, selections)
+                await context.bot.send_message(
+                    chat_id=user_id,
+                    text=text,
+                    reply_markup=reply_markup
+                )
+                return
             
-            # Progress
-            progress = f"({current_q + 1}/{len(questions)})"
+            if session.get('mode') == 'poll' and await self.send_quiz_poll(context, user_id, subject_id,
+                                                                           session, all_questions):
+                return
             
-            # Savol matnini tayyorlash
-            question_text = question['question']
-            if len(question_text) > 1000:
+            head, text, reply_markup = self.build_question_message(user_id, subject_id, session, all_questions)
+            if head is not None:
                 # Uzun savollarni bo'laklab yuborish
                 await context.bot.send_message(
                     chat_id=user_id,
-                    text=question_text[:1000]
+                    text=head
                 )
-                question_text = question_text[1000:2000] + "..." if len(question_text) > 2000 else question_text[1000:]
             
             await context.bot.send_message(
                 chat_id=user_id,
-                text=f"❓ Savol {progress}\n\n{question_text}",
+                text=text,
                 reply_markup=reply_markup
             )
             
-            # Sessionni saqlash
-            self.db.save_user_session(user_id, subject_id,
-                                    session['questions'],
-                                    session['current_question'],
-                                    session['answers'],
-                                    session['score'],
-                                    session['total_questions'])
-            
         except Exception as e:
             logger.error(f"Send question error: {e}")
             await context.bot.send_message(
@@ -296,44 +404,378 @@ class UserHandlers:
                 text="❌ Savol yuborishda xatolik yuz berdi. Iltimos, qaytadan urinib ko'ring."
             )
     
+    async def send_quiz_poll(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, subject_id: int,
+                             session: dict, all_questions) -> bool:
+        """Joriy savolni Telegram viktorinasi sifatida yuborish (mos kelmasa False)"""
+        current_q = session['current_question']
+        question = all_questions[session['question_ids'][current_q]]
+        if len(question.options) > POLL_MAX_OPTIONS:
+            # Viktorinaga sig'maydi - odatiy tugmalar bilan yuboriladi
+            return False
+        
+        permutation = option_permutation(session, current_q, len(question.options))
+        options = []
+        for i in permutation:
+            option = question.options[i]
+            options.append(option if len(option) <= POLL_OPTION_LIMIT else option[:POLL_OPTION_LIMIT - 3] + "...")
+        
+        progress = f"({current_q + 1}/{len(session['question_ids'])})"
+        poll_question = f"{progress} {question.question}"
+        if len(poll_question) > POLL_QUESTION_LIMIT:
+            # Uzun savol matni alohida xabarda, viktorinada faqat raqami
+            await context.bot.send_message(chat_id=user_id, text=f"❓ Savol {progress}\n\n{question.question[:4000]}")
+            poll_question = f"❓ Savol {progress}"
+        
+        message = await context.bot.send_poll(
+            chat_id=user_id,
+            question=poll_question,
+            options=options,
+            type='quiz',
+            correct_option_id=permutation.index(question.correct_answer),
+            is_anonymous=False
+        )
+        self.polls.add(message.poll.id, user_id, subject_id, session_nonce(session['session_id']), current_q)
+        return True
+    
+    async def handle_poll_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Viktorina javobi: natijani Telegram ko'rsatadi, bot faqat qayd etib keyingi savolni yuboradi"""
+        answer = update.poll_answer
+        user_id = None
+        try:
+            if not answer.option_ids:
+                return
+            
+            entry = self.polls.get(answer.poll_id)
+            if entry is None and answer.user is not None:
+                # Qayta ishga tushishdan oldingi viktorina: joriy savol qayta yuboriladi
+                await self.resume_polls(context, answer.user.id)
+                return
+            if entry is None or answer.user is None or answer.user.id != entry[0]:
+                return
+            self.polls.pop(answer.poll_id)
+            user_id, subject_id, nonce, question_index = entry
+            
+            session = await self.sessions.get(user_id, subject_id)
+            if not session or session_nonce(session['session_id']) != nonce:
+                return
+            if question_index != session['current_question']:
+                return
+            
+            all_questions = await self.get_session_questions(subject_id, session)
+            if all_questions is None:
+                await self.sessions.delete(user_id, subject_id)
+                await context.bot.send_message(
+                    chat_id=user_id,
+                    text="❌ Fan savollari yangilangan. Iltimos, testni qaytadan boshlang."
+                )
+                return
+            
+            question_id = session['question_ids'][question_index]
+            question = all_questions[question_id]
+            permutation = option_permutation(session, question_index, len(question.options))
+            selected_option = answer.option_ids[0]
+            if selected_option >= len(permutation):
+                return
+            
+            selected = permutation[selected_option]
+            if not await self.sessions.record_answer(user_id, subject_id, question_index, question_id,
+                                                     selected, selected == question.correct_answer, advance=True):
+                return
+            
+            await self.send_question(context, user_id, subject_id)
+            
+        except Exception as e:
+            logger.error(f"Poll answer error: {e}")
+            if user_id is not None:
+                await context.bot.send_message(
+                    chat_id=user_id,
+                    text="❌ Javobni qayd etishda xatolik yuz berdi. Iltimos, qaytadan urinib ko'ring."
+                )
+    
+    async def resume_polls(self, context: ContextTypes.DEFAULT_TYPE, user_id: int):
+        """Viktorina rejimidagi sessiyalarning javob kutilmayotgan joriy savolini qayta yuborish"""
+        for subject_id in await self.db.get_user_poll_subjects(user_id):
+            session = await self.sessions.skip_answered(user_id, subject_id)
+            if not session or session.get('mode') != 'poll':
+                continue
+            current_q = session['current_question']
+            if current_q >= len(session['question_ids']):
+                continue
+            if self.polls.is_open(user_id, subject_id, session_nonce(session['session_id']), current_q):
+                continue
+            await self.send_question(context, user_id, subject_id)
+    
+    def build_question_message(self, user_id: int, subject_id: int, session: dict, all_questions):
+        """Joriy savol xabari: (uzun savolning alohida boshi yoki None, matn, klaviatura)"""
+        current_q = session['current_question']
+        question_ids = session['question_ids']
+        question = all_questions[question_ids[current_q]]
+        
+        # Variantlar tartibi sessiya seed'idan aniqlanadi
+        permutation = option_permutation(session, current_q, len(question.options))
+        shuffled_options = [question.options[i] for i in permutation]
+        
+        # Klaviatura yaratish
+        keyboard = []
+        for i, option in enumerate(shuffled_options):
+            # Uzun variantlarni qisqartirish
+            display_option = option
+            if len(option) > 50:
+                display_option = option[:50] + "..."
+            
+            # Tugmada to'g'ri javob yo'q: faqat imzolangan (sessiya, savol, variant)
+            keyboard.append([InlineKeyboardButton(
+                f"{chr(65+i)}) {display_option}", 
+                callback_data=self.signer.encode_answer(user_id, subject_id, session_nonce(session['session_id']),
+                                                        current_q, i)
+            )])
+        
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        # Progress
+        progress = f"({current_q + 1}/{len(question_ids)})"
+        
+        # Savol matnini tayyorlash
+        head = None
+        question_text = question.question
+        if len(question_text) > 1000:
+            head = question_text[:1000]
+            question_text = question_text[1000:2000] + "..." if len(question_text) > 2000 else question_text[1000:]
+        
+        return head, f"❓ Savol {progress}\n\n{question_text}", reply_markup
+    
+    @staticmethod
+    def page_questions(session: dict, all_questions) -> list:
+        """Joriy sahifa: [(savol o'rni, savol, variantlar tartibi, matn bloki)]"""
+        question_ids = session['question_ids']
+        page = []
+        length = 0
+        for index in range(session['current_question'],
+                           min(session['current_question'] + QUESTIONS_PER_PAGE, len(question_ids))):
+            question = all_questions[question_ids[index]]
+            permutation = option_permutation(session, index, len(question.options))
+            lines = [f"{index + 1}. {question.question[:1000]}"]
+            for i, option_index in enumerate(permutation):
+                lines.append(f"   {chr(65 + i)}) {question.options[option_index][:200]}")
+            block = "\n".join(lines)
+            
+            # Sahifa matni chegaradan oshmasin (kamida bitta savol)
+            if page and length + len(block) > PAGE_TEXT_LIMIT:
+                break
+            length += len(block) + 2
+            page.append((index, question, permutation, block))
+        return page
+    
+    def build_page_message(self, user_id: int, subject_id: int, session: dict, all_questions, selections: dict):
+        """Sahifa xabari: (matn, klaviatura)"""
+        page = self.page_questions(session, all_questions)
+        start = page[0][0]
+        end = page[-1][0] + 1
+        text = (f"📄 Savollar {start + 1}–{end} / {len(session['question_ids'])}\n\n"
+                + "\n\n".join(block for _, _, _, block in page)
+                + "\n\n✏️ Javoblarni belgilab, «Yuborish» tugmasini bosing.")
+        return text, self.build_page_keyboard(user_id, subject_id, session, page, selections)
+    
+    def build_page_keyboard(self, user_id: int, subject_id: int, session: dict, page: list, selections: dict):
+        """Har bir savol uchun ixcham variantlar qatori va yuborish tugmasi"""
+        nonce = session_nonce(session['session_id'])
+        keyboard = []
+        for index, _, permutation, _ in page:
+            row = []
+            for i in range(len(permutation)):
+                label = f"{index + 1}{chr(65 + i)}"
+                row.append(InlineKeyboardButton(
+                    f"✅{label}" if selections.get(index) == i else label,
+                    callback_data=self.signer.encode_answer(user_id, subject_id, nonce, index, i, prefix=PAGE_PREFIX)
+                ))
+            keyboard.append(row)
+        
+        chosen = sum(1 for index, _, _, _ in page if index in selections)
+        keyboard.append([InlineKeyboardButton(
+            f"📨 Yuborish ({chosen}/{len(page)})",
+            callback_data=f"pagesubmit_{subject_id}_{page[0][0]}"
+        )])
+        return InlineKeyboardMarkup(keyboard)
+    
+    async def handle_page_pick(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Sahifali rejimda variant tanlash (bazaga yozilmaydi)"""
+        try:
+            query = update.callback_query
+            user_id = query.from_user.id
+            
+            decoded = self.signer.decode_answer(user_id, query.data, prefix=PAGE_PREFIX)
+            if decoded is None:
+                await query.answer("Xato: tugma eskirgan yoki noto'g'ri!", show_alert=True)
+                return
+            subject_id, nonce, question_index, selected_option = decoded
+            
+            session = await self.sessions.get(user_id, subject_id)
+            if not session or session_nonce(session['session_id']) != nonce:
+                await query.answer("Bu tugma tugagan testga tegishli!")
+                return
+            
+            all_questions = await self.get_session_questions(subject_id, session)
+            if all_questions is None:
+                await self.sessions.delete(user_id, subject_id)
+                await query.edit_message_text("❌ Fan savollari yangilangan. Iltimos, testni qaytadan boshlang.")
+                return
+            
+            page = self.page_questions(session, all_questions)
+            permutation = next((p for index, _, p, _ in page if index == question_index), None)
+            if permutation is None:
+                await query.answer("Bu sahifa yuborilgan!")
+                return
+            if selected_option >= len(permutation):
+                await query.answer("Xato: Noto'g'ri format!", show_alert=True)
+                return
+            
+            selections = await self.sessions.page_selections(user_id, subject_id)
+            await query.answer()
+            if selections.get(question_index) == selected_option:
+                return
+            selections[question_index] = selected_option
+            
+            # Faqat klaviatura yangilanadi
+            await query.edit_message_reply_markup(
+                reply_markup=self.build_page_keyboard(user_id, subject_id, session, page, selections)
+            )
+            
+        except Exception as e:
+            logger.error(f"Page pick error: {e}")
+            await update.callback_query.answer("Xatolik yuz berdi!", show_alert=True)
+    
+    async def handle_page_submit(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Sahifani yuborish: javoblarni tekshirish va keyingi sahifani shu xabarda ko'rsatish"""
+        try:
+            query = update.callback_query
+            user_id = query.from_user.id
+            
+            _, subject_id, start = query.data.split('_')
+            subject_id, start = int(subject_id), int(start)
+            
+            session = await self.sessions.get(user_id, subject_id)
+            if not session:
+                await query.edit_message_text("❌ Test sessiyasi topilmadi. Iltimos, qaytadan boshlang.")
+                return
+            if session['current_question'] != start:
+                await query.answer("Bu sahifa yuborilgan!")
+                return
+            
+            all_questions = await self.get_session_questions(subject_id, session)
+            if all_questions is None:
+                await self.sessions.delete(user_id, subject_id)
+                await query.edit_message_text("❌ Fan savollari yangilangan. Iltimos, testni qaytadan boshlang.")
+                return
+            
+            page = self.page_questions(session, all_questions)
+            selections = await self.sessions.page_selections(user_id, subject_id)
+            chosen = sum(1 for index, _, _, _ in page if index in selections)
+            if chosen < len(page):
+                await query.answer(f"Barcha savollarga javob bering ({chosen}/{len(page)})", show_alert=True)
+                return
+            
+            # Javoblarni tekshirish (asl variant indekslari bilan)
+            answers = []
+            marks = []
+            for index, question, permutation, _ in page:
+                selected = permutation[selections[index]]
+                is_correct = selected == question.correct_answer
+                answers.append((index, session['question_ids'][index], selected, is_correct))
+                if is_correct:
+                    marks.append(f"{index + 1}✅")
+                else:
+                    marks.append(f"{index + 1}❌{chr(65 + permutation.index(question.correct_answer))}")
+            
+            await query.answer()
+            end = page[-1][0] + 1
+            session = await self.sessions.record_page(user_id, subject_id, start, answers, end)
+            if session is None:
+                # Parallel bosilgan yuborish tugmasi
+                return
+            
+            page_score = sum(1 for answer in answers if answer[3])
+            verdict = f"📄 {start + 1}–{end}: {page_score}/{len(page)} to'g'ri\n" + " ".join(marks)
+            
+            if session['current_question'] >= len(session['question_ids']):
+                await query.edit_message_text(verdict)
+                await self.show_results(context, user_id, subject_id)
+                return
+            
+            # Natija va keyingi sahifa bitta tahrirda
+            text, reply_markup = self.build_page_message(user_id, subject_id, session, all_questions, {})
+            await query.edit_message_text(text=f"{verdict}\n\n{text}", reply_markup=reply_markup)
+            
+        except Exception as e:
+            logger.error(f"Page submit error: {e}")
+            await update.callback_query.answer("Xatolik yuz berdi!", show_alert=True)
+    
     async def handle_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Javobni qayta ishlash - real vaqtda natijani ko'rsatish"""
+        tap = None
         try:
             query = update.callback_query
             user_id = query.from_user.id
-            data_parts = query.data.split('_')
             
             logger.info(f"Answer callback received: {query.data}")
             
-            if len(data_parts) < 5:
-                await query.answer("Xato: Noto'g'ri format!", show_alert=True)
+            # Imzo tekshiruvi va qayta bosish - sessiya va bazaga murojaatsiz
+            decoded = self.signer.decode_answer(user_id, query.data)
+            if decoded is None:
+                await query.answer("Xato: tugma eskirgan yoki noto'g'ri!", show_alert=True)
                 return
             
-            subject_id = int(data_parts[1])
-            question_index = int(data_parts[2])  # Savol indeksi
-            selected_option = int(data_parts[3]) # Tanlangan variant indeksi (aralashtirilgan)
-            correct_index = int(data_parts[4])   # To'g'ri javob indeksi (aralashtirilgan)
+            subject_id, nonce, question_index, selected_option = decoded
+            tap = (user_id, nonce, question_index)
+            if not self.answered_taps.check_and_add(tap):
+                tap = None
+                await query.answer("Bu savolga javob berilgan!")
+                return
             
-            session = self.db.get_user_session(user_id, subject_id)
+            session = await self.sessions.get(user_id, subject_id)
             if not session:
                 await query.edit_message_text("❌ Test sessiyasi topilmadi. Iltimos, qaytadan boshlang.")
                 return
             
+            if session_nonce(session['session_id']) != nonce:
+                # Oldingi testdagi tugma
+                await query.answer("Bu tugma tugagan testga tegishli!")
+                return
+            
+            if question_index > session['current_question']:
+                # Qayta ishga tushgandan keyin sessiya oxirgi checkpoint'dan davom etadi
+                self.answered_taps.discard(tap)
+                tap = None
+                await query.answer("Test oxirgi saqlangan savoldan davom etadi")
+                await self.send_question(context, user_id, subject_id)
+                return
+            
+            if question_index != session['current_question']:
+                # Eski xabardagi tugma
+                await query.answer("Bu savolga javob berilgan!")
+                return
+            
+            all_questions = await self.get_session_questions(subject_id, session)
+            if all_questions is None:
+                await self.sessions.delete(user_id, subject_id)
+                await query.edit_message_text("❌ Fan savollari yangilangan. Iltimos, testni qaytadan boshlang.")
+                return
+            
+            question_data = all_questions[session['question_ids'][question_index]]
+            permutation = option_permutation(session, question_index, len(question_data.options))
+            shuffled_options = [question_data.options[i] for i in permutation]
+            
+            # To'g'ri javob sessiyadagi tartibdan hisoblanadi
+            correct_index = permutation.index(question_data.correct_answer)
+            
+            if selected_option >= len(shuffled_options):
+                await query.answer("Xato: Noto'g'ri format!", show_alert=True)
+                return
+            
             # Javobni tekshirish
             is_correct = (selected_option == correct_index)
             
             logger.info(f"User {user_id} selected: {selected_option}, correct: {correct_index}, is_correct: {is_correct}")
             
-            # Aralashtirilgan variantlarni olish
-            shuffled_options = session['questions'][question_index].get('shuffled_options', [])
-            
-            if not shuffled_options:
-                # Agar aralashtirilgan variantlar saqlanmagan bo'lsa, qayta aralashtirish
-                original_options = session['questions'][question_index]['options'].copy()
-                shuffled_indices = list(range(len(original_options)))
-                random.shuffle(shuffled_indices)
-                shuffled_options = [original_options[i] for i in shuffled_indices]
-            
             # Tanlangan javob matni
             selected_answer_text = shuffled_options[selected_option]
             selected_answer_letter = chr(65 + selected_option)  # A, B, C, D
@@ -342,25 +784,29 @@ class UserHandlers:
             correct_answer_text = shuffled_options[correct_index]
             correct_answer_letter = chr(65 + correct_index)
             
-            # Javob ma'lumotlarini saqlash
-            question_data = session['questions'][question_index]
-            session['answers'].append({
-                'question': question_data['question'],
-                'selected': selected_option,
-                'correct': correct_index,
-                'is_correct': is_correct,
-                'options': shuffled_options,
-                'selected_text': selected_answer_text,
-                'correct_text': correct_answer_text
-            })
-            
-            if is_correct:
-                session['score'] += 1
+            # Javobni jurnalga yozish (asl variant indeksi); tezkor rejimda keyingi savolga ham o'tiladi
+            fast = session.get('mode') == 'fast'
+            if not await self.sessions.record_answer(user_id, subject_id, question_index,
+                                                     session['question_ids'][question_index],
+                                                     permutation[selected_option], is_correct, advance=fast):
+                # Qayta bosilgan tugma
+                await query.answer("Bu savolga javob berilgan!")
+                return
             
             # REAL VAQTDA NATIJANI KO'RSATISH
-            current_question = session['current_question']
+            current_question = question_index
             total_questions = session['total_questions']
             
+            if fast:
+                # Natija va keyingi savol bitta tahrirda
+                if is_correct:
+                    verdict = f"✅ ({current_question + 1}/{total_questions}) To'g'ri!"
+                else:
+                    verdict = (f"❌ ({current_question + 1}/{total_questions}) Noto'g'ri. "
+                               f"To'g'ri javob: {correct_answer_letter}) {correct_answer_text}")
+                await self.continue_fast(query, context, user_id, subject_id, verdict)
+                return
+            
             # Natija xabarini tayyorlash
             if is_correct:
                 result_icon = "✅"
@@ -373,7 +819,7 @@ class UserHandlers:
             progress = f"({current_question + 1}/{total_questions})"
             
             # Yangilangan savol matni
-            question_display = f"{result_icon} Savol {progress}\n\n{question_data['question']}\n\n{result_text}"
+            question_display = f"{result_icon} Savol {progress}\n\n{question_data.question}\n\n{result_text}"
             
             # Keyingi savol tugmasi
             keyboard = [[InlineKeyboardButton("➡️ Keyingi savol", callback_data=f"next_{subject_id}")]]
@@ -386,18 +832,40 @@ class UserHandlers:
                 parse_mode='Markdown'
             )
             
-            # Sessionni saqlash
-            self.db.save_user_session(user_id, subject_id,
-                                    session['questions'],
-                                    session['current_question'],
-                                    session['answers'],
-                                    session['score'],
-                                    session['total_questions'])
-            
         except Exception as e:
             logger.error(f"Handle answer error: {e}")
+            # Xatolikdan keyin foydalanuvchi qayta bosa olsin
+            if tap is not None:
+                self.answered_taps.discard(tap)
             await update.callback_query.answer("Xatolik yuz berdi!", show_alert=True)
     
+    async def continue_fast(self, query, context: ContextTypes.DEFAULT_TYPE, user_id: int, subject_id: int,
+                            verdict: str):
+        """Tezkor rejim: shu xabarni natija va keyingi savol bilan yangilash"""
+        session = await self.sessions.get(user_id, subject_id)
+        if session is None:
+            await query.edit_message_text(verdict)
+            return
+        if session['current_question'] >= len(session['question_ids']):
+            await query.edit_message_text(verdict)
+            await self.show_results(context, user_id, subject_id)
+            return
+        
+        all_questions = await self.get_session_questions(subject_id, session)
+        if all_questions is None:
+            await self.sessions.delete(user_id, subject_id)
+            await query.edit_message_text(f"{verdict}\n\n❌ Fan savollari yangilangan. Iltimos, testni qaytadan boshlang.")
+            return
+        
+        head, text, reply_markup = self.build_question_message(user_id, subject_id, session, all_questions)
+        if head is not None:
+            # Uzun savol bitta xabarga sig'maydi - odatiy yuborish
+            await query.edit_message_text(verdict)
+            await self.send_question(context, user_id, subject_id)
+            return
+        
+        await query.edit_message_text(text=f"{verdict}\n\n{text}", reply_markup=reply_markup)
+    
     async def handle_next_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Keyingi savolga o'tish"""
         try:
@@ -415,23 +883,12 @@ class UserHandlers:
             
             await query.answer()
             
-            # Sessionni olish
-            session = self.db.get_user_session(user_id, subject_id)
+            # Keyingi savolga o'tish (keshda, bazaga checkpoint orqali yoziladi)
+            session = await self.sessions.advance(user_id, subject_id)
             if not session:
                 await query.edit_message_text("❌ Test sessiyasi topilmadi. Iltimos, qaytadan boshlang.")
                 return
             
-            # Keyingi savolga o'tish
-            session['current_question'] += 1
-            
-            # Yangilangan sessionni saqlash
-            self.db.save_user_session(user_id, subject_id,
-                                    session['questions'],
-                                    session['current_question'],
-                                    session['answers'],
-                                    session['score'],
-                                    session['total_questions'])
-            
             # Keyingi savolni yuborish
             await self.send_question(context, user_id, subject_id)
             
@@ -442,7 +899,7 @@ class UserHandlers:
     async def show_results(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, subject_id: int):
         """Natijalarni ko'rsatish"""
         try:
-            session = self.db.get_user_session(user_id, subject_id)
+            session = await self.sessions.get(user_id, subject_id)
             if not session:
                 await context.bot.send_message(
                     chat_id=user_id,
@@ -450,16 +907,20 @@ class UserHandlers:
                 )
                 return
             
+            # Keshdagi javoblarni bazaga yozish
+            await self.sessions.finish(user_id, subject_id)
+            
             total = session['total_questions']
             score = session['score']
             percentage = round((score / total) * 100, 1) if total > 0 else 0
             
-            subject_name = self.db.get_subject_file(subject_id)[0]
+            subject_name = (await self.db.get_subject_file(subject_id))[0]
             user = await context.bot.get_chat(user_id)
             user_name = user.first_name
             
-            # Natijani bazaga saqlash
-            self.db.save_result(user_id, user_name, subject_id, score, total, percentage)
+            # Natijani bazaga saqlash (commit bo'lishi kutiladi)
+            await self.db.save_result(user_id, user_name, subject_id, score, total, percentage,
+                                      session['session_id'], wait=True)
             
             # Natija xabarini tayyorlash
             result_text = f"🏆 TEST YAKUNLANDI!\n\n"
@@ -497,8 +958,8 @@ class UserHandlers:
                 reply_markup=reply_markup
             )
             
-            # Sessionni tozalash
-            self.db.delete_user_session(user_id, subject_id)
+            # Sessionni tozalash (javoblar jurnali natija bilan qoladi)
+            await self.sessions.delete(user_id, subject_id, keep_answers=True)
             
         except Exception as e:
             logger.error(f"Show results error: {e}")
@@ -568,13 +1029,13 @@ Agar test ishlashda muammo bo'lsa, /start buyrug'i orqali qaytadan boshlang.
             user_id = update.message.from_user.id
             
             # Foydalanuvchining barcha aktiv sessionlarini topish
-            subjects = self.db.get_subjects()
+            subjects = await self.db.get_subjects()
             cancelled_sessions = 0
             
             for subject_id, subject_name in subjects:
-                session = self.db.get_user_session(user_id, subject_id)
+                session = await self.sessions.get(user_id, subject_id)
                 if session:
-                    self.db.delete_user_session(user_id, subject_id)
+                    await self.sessions.delete(user_id, subject_id)
                     cancelled_sessions += 1
             
             if cancelled_sessions > 0:
@@ -594,7 +1055,7 @@ Agar test ishlashda muammo bo'lsa, /start buyrug'i orqali qaytadan boshlang.
     async def list_subjects(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Fanlar ro'yxatini ko'rsatish"""
         try:
-            subjects = self.db.get_subjects()
+            subjects = await self.db.get_subjects()
             
             if not subjects:
                 await update.message.reply_text(
@@ -623,4 +1084,5 @@ Agar test ishlashda muammo bo'lsa, /start buyrug'i orqali qaytadan boshlang.
             CommandHandler("stats", self.stats_command),
             CommandHandler("cancel", self.cancel_test),
             CommandHandler("subjects", self.list_subjects),
+            PollAnswerHandler(self.handle_poll_answer),
         ]
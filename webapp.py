@@ -0,0 +1,295 @@
+import os
+import sys
+import gzip
+import hmac
+import json
+import time
+import types
+import asyncio
+import hashlib
+import logging
+from urllib.parse import parse_qsl, urlencode, urlsplit, quote
+from telegram.ext import CallbackContext
+from config import BOT_TOKEN, WEBAPP_HOST, WEBAPP_PORT, WEBAPP_INIT_DATA_MAX_AGE
+from session_cache import option_permutation
+from callback_signer import session_nonce
+
+logger = logging.getLogger(__name__)
+
+WEBAPP_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'webapp.html')
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 256 * 1024
+REQUEST_TIMEOUT = 30  # soniya
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+            409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+def _init_data_hash(fields: dict, bot_token: str) -> str:
+    # Telegram algoritmi: kalit = HMAC("WebAppData", token), xesh = HMAC(kalit, saralangan "k=v" qatorlar)
+    secret = hmac.new(b'WebAppData', bot_token.encode('utf-8'), hashlib.sha256).digest()
+    check_string = "\n".join(f"{key}={value}" for key, value in sorted(fields.items()))
+    return hmac.new(secret, check_string.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def check_init_data(init_data: str, bot_token: str = BOT_TOKEN, max_age: float = WEBAPP_INIT_DATA_MAX_AGE):
+    """Mini App initData imzosini tekshirish: foydalanuvchi lug'ati yoki None"""
+    try:
+        fields = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=True))
+    except ValueError:
+        return None
+    received = fields.pop('hash', '')
+    if not received or not hmac.compare_digest(received, _init_data_hash(fields, bot_token)):
+        return None
+    try:
+        if time.time() - int(fields['auth_date']) > max_age:
+            return None
+        user = json.loads(fields['user'])
+    except (KeyError, ValueError):
+        return None
+    if not isinstance(user, dict) or not isinstance(user.get('id'), int):
+        return None
+    return user
+
+def sign_init_data(user: dict, bot_token: str = BOT_TOKEN, auth_date: int = None) -> str:
+    """Telegramsiz lokal sinov uchun initData yasash (Telegram bilan bir xil imzo)"""
+    fields = {
+        'auth_date': str(int(auth_date if auth_date is not None else time.time())),
+        'query_id': 'local',
+        'user': json.dumps(user, ensure_ascii=False, separators=(',', ':')),
+    }
+    fields['hash'] = _init_data_hash(fields, bot_token)
+    return urlencode(fields)
+
+class WebAppServer:
+    """Mini App rejimi uchun ichki HTTP server.
+
+    GET /         - test ilovasi (statik, ETag bilan keshlanadi)
+    GET /bundle   - sessiyaning qolgan savollari va variantlar tartibi; URL
+                    sessiya va boshlanish o'rniga bog'langani uchun o'zgarmas
+    POST /submit  - barcha javoblar bitta so'rovda; initData imzosi tekshiriladi,
+                    javoblar serverda ixcham bank bo'yicha baholanadi
+
+    So'rovlar X-Telegram-Init-Data sarlavhasidagi initData bilan
+    tasdiqlanadi. Server HTTPS ni o'zi bajarmaydi: WEBAPP_URL odatda
+    teskari proksi orqali shu portga yo'naltiriladi.
+    """
+    
+    def __init__(self, user_handlers, bot_token: str = BOT_TOKEN, host: str = WEBAPP_HOST, port: int = WEBAPP_PORT):
+        self.user_handlers = user_handlers
+        self.bot_token = bot_token
+        self.host = host
+        self.port = port
+        self.application = None
+        self._server = None
+        with open(WEBAPP_PAGE, 'rb') as f:
+            self.page = f.read()
+        self.page_etag = '"' + hashlib.blake2b(self.page, digest_size=8).hexdigest() + '"'
+    
+    async def start(self, application):
+        """Serverni ishga tushirish (natija xabarlari application.bot orqali yuboriladi)"""
+        self.application = application
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Mini App serveri {self.host}:{self.port} da ishga tushdi")
+    
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+    
+    async def _handle(self, reader, writer):
+        try:
+            status, headers, body = await asyncio.wait_for(self._serve(reader), REQUEST_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            status, headers, body = self._json(400, {'error': "Noto'g'ri so'rov"})
+        except Exception as e:
+            logger.error(f"Mini App so'rovida xatolik: {e}")
+            status, headers, body = self._json(500, {'error': "Xatolik yuz berdi"})
+        
+        head = [f"HTTP/1.1 {status} {_REASONS[status]}", f"Content-Length: {len(body)}", "Connection: close"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode('utf-8') + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def _serve(self, reader):
+        request = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        method, target, _ = request[0].split(' ', 2)
+        headers = {}
+        for line in request[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query))
+        if method == 'GET' and url.path in ('/', '/index.html'):
+            return self._page(headers)
+        if method == 'GET' and url.path == '/bundle':
+            return await self._bundle(headers, query)
+        if method == 'POST' and url.path == '/submit':
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY_BYTES:
+                return self._json(413, {'error': "So'rov juda katta"})
+            return await self._submit(headers, await reader.readexactly(length))
+        return self._json(404, {'error': "Topilmadi"})
+    
+    @staticmethod
+    def _json(status: int, data: dict, headers: dict = None, compress: bool = False):
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        headers = dict(headers or {}, **{'Content-Type': 'application/json; charset=utf-8'})
+        if compress:
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        return status, headers, body
+    
+    def _page(self, headers: dict):
+        cache = {'ETag': self.page_etag, 'Cache-Control': 'public, max-age=3600'}
+        if headers.get('if-none-match') == self.page_etag:
+            return 304, cache, b''
+        return 200, dict(cache, **{'Content-Type': 'text/html; charset=utf-8'}), self.page
+    
+    async def _session(self, headers: dict, subject_id, nonce, start):
+        """((foydalanuvchi, fan, sessiya), None) yoki (None, (HTTP holati, xato matni))"""
+        user = check_init_data(headers.get('x-telegram-init-data', ''), self.bot_token)
+        if user is None:
+            return None, (401, "initData imzosi noto'g'ri yoki eskirgan")
+        try:
+            subject_id, nonce, start = int(subject_id), int(nonce), int(start)
+        except (TypeError, ValueError):
+            return None, (400, "Noto'g'ri so'rov")
+        
+        session = await self.user_handlers.sessions.get(user['id'], subject_id)
+        if (not session or session.get('mode') != 'webapp'
+                or session_nonce(session['session_id']) != nonce):
+            return None, (404, "Test sessiyasi topilmadi. Iltimos, qaytadan boshlang.")
+        if session['current_question'] != start:
+            return None, (409, "Bu test javoblari allaqachon yuborilgan")
+        return (user, subject_id, session), None
+    
+    async def _bundle(self, headers: dict, query: dict):
+        found, error = await self._session(headers, query.get('subject'), query.get('session'), query.get('start'))
+        if error:
+            return self._json(error[0], {'error': error[1]})
+        user, subject_id, session = found
+        
+        all_questions = await self.user_handlers.get_session_questions(subject_id, session)
+        if all_questions is None:
+            return self._json(409, {'error': "Fan savollari yangilangan. Iltimos, testni qaytadan boshlang."})
+        
+        # To'g'ri javoblar yuborilmaydi; variantlar sessiya tartibida
+        start = session['current_question']
+        questions = []
+        for index in range(start, len(session['question_ids'])):
+            question = all_questions[session['question_ids'][index]]
+            permutation = option_permutation(session, index, len(question.options))
+            questions.append({'q': question.question, 'o': [question.options[i] for i in permutation]})
+        
+        bundle = {'start': start, 'total': len(session['question_ids']), 'questions': questions}
+        # URL (sessiya, boshlanish) bo'yicha o'zgarmas - mijoz keshida qoladi
+        cache = {'Cache-Control': 'private, max-age=86400, immutable', 'Vary': 'Accept-Encoding'}
+        return self._json(200, bundle, cache, compress='gzip' in headers.get('accept-encoding', ''))
+    
+    async def _submit(self, headers: dict, body: bytes):
+        try:
+            payload = json.loads(body)
+            answers = payload['answers']
+        except (ValueError, KeyError, TypeError):
+            return self._json(400, {'error': "Noto'g'ri so'rov"})
+        
+        found, error = await self._session(headers, payload.get('subject'), payload.get('session'), payload.get('start'))
+        if error:
+            return self._json(error[0], {'error': error[1]})
+        user, subject_id, session = found
+        user_id = user['id']
+        
+        all_questions = await self.user_handlers.get_session_questions(subject_id, session)
+        if all_questions is None:
+            return self._json(409, {'error': "Fan savollari yangilangan. Iltimos, testni qaytadan boshlang."})
+        
+        start = session['current_question']
+        question_ids = session['question_ids']
+        if not isinstance(answers, list) or len(answers) != len(question_ids) - start:
+            return self._json(400, {'error': "Javoblar soni savollar soniga mos emas"})
+        
+        # Javoblar serverda baholanadi (asl variant indekslari bilan, -1 - javobsiz)
+        records = []
+        for index, choice in enumerate(answers, start):
+            question = all_questions[question_ids[index]]
+            if not isinstance(choice, int) or not -1 <= choice < len(question.options):
+                return self._json(400, {'error': "Noto'g'ri javob formati"})
+            if choice < 0:
+                records.append((index, question_ids[index], -1, False))
+                continue
+            selected = option_permutation(session, index, len(question.options))[choice]
+            records.append((index, question_ids[index], selected, selected == question.correct_answer))
+        
+        sessions = self.user_handlers.sessions
+        session = await sessions.record_page(user_id, subject_id, start, records, len(question_ids))
+        if session is None:
+            return self._json(409, {'error': "Bu test javoblari allaqachon yuborilgan"})
+        
+        total = session['total_questions']
+        score = session['score']
+        result = {'score': score, 'total': total, 'percentage': round((score / total) * 100, 1) if total > 0 else 0}
+        
+        # Natija xabari va bazaga yozish - odatiy yakunlash orqali
+        await self.user_handlers.show_results(CallbackContext(self.application), user_id, subject_id)
+        return self._json(200, result)
+
+class _ConsoleBot:
+    """Lokal sinov: bot xabarlarini konsolga chiqarish"""
+    
+    async def get_chat(self, chat_id):
+        return types.SimpleNamespace(id=chat_id, first_name="Sinov")
+    
+    async def send_message(self, chat_id, text, **kwargs):
+        print(f"\n[{chat_id} ga xabar]\n{text}\n")
+
+async def _local_demo(subject_id: int, count: str, user_id: int):
+    # Telegramsiz sinov: sessiya yaratiladi va imzolangan initData bilan havola chiqariladi
+    from database import DatabaseManager, AsyncDatabaseManager
+    from bank_loader import BankLoader
+    from bank_cache import BankCache
+    from user_handlers import UserHandlers
+    
+    db = AsyncDatabaseManager(DatabaseManager())
+    loader = BankLoader()
+    user_handlers = UserHandlers(db, BankCache(loader, db))
+    server = WebAppServer(user_handlers)
+    try:
+        subject = await db.get_subject_file(subject_id)
+        if not subject:
+            print(f"Fan topilmadi: {subject_id}")
+            return
+        all_questions, bank_version = await user_handlers.load_questions(subject_id, subject[1])
+        session = user_handlers.new_session(all_questions, bank_version, count, 'webapp')
+        if session is None:
+            print("Faylda to'g'ri formatdagi savollar topilmadi")
+            return
+        await user_handlers.sessions.start(user_id, subject_id, session)
+        
+        await server.start(types.SimpleNamespace(bot=_ConsoleBot()))
+        init_data = sign_init_data({'id': user_id, 'first_name': "Sinov"})
+        print(f"http://127.0.0.1:{server.port}/?subject={subject_id}&session={session_nonce(session['session_id'])}"
+              f"&start=0#tgWebAppData={quote(init_data)}")
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+        await user_handlers.sessions.close()
+        db.close()
+        loader.close()
+
+if __name__ == '__main__':
+    # python webapp.py [fan ID] [savollar soni | all] [foydalanuvchi ID]
+    logging.basicConfig(level=logging.INFO)
+    args = sys.argv[1:]
+    try:
+        asyncio.run(_local_demo(int(args[0]) if args else 1, args[1] if len(args) > 1 else '10',
+                                int(args[2]) if len(args) > 2 else 1))
+    except KeyboardInterrupt:
+        pass